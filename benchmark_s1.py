@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""Benchmark s1 transcript fetching and video downloads against fakes.
+
+``FakeTranscriptService`` stands in for YouTube: every request takes
+``--latency`` seconds and, like YouTube, it blocks requests (raising
+``RequestBlocked``) while more than ``--max-rate`` requests per second arrived
+over the last ``--window`` seconds. Its clients are handed to
+``s1_YouTube_downloader.download_transcripts``, which fetches with its thread
+pool and adaptive rate limiter. The same IDs are then fetched by the original
+loop (one request at a time, ``time.sleep`` of 1-2 s before each, +0.1 s after
+a block), kept below as ``reference_download_transcripts``.
+
+Videos are "downloaded" by ``FakeDownloader``, a stand-in for ``YoutubeDL``
+that costs ``--setup-seconds`` to construct, spends ``--extract-latency``
+seconds on metadata and then streams ``--video-mb`` per video through yt-dlp
+progress hooks at ``--limit-rate`` MB/s per download, sharing a link of
+``--link-rate`` MB/s. ``download_videos`` with its worker threads is compared
+with the original loop, which builds a new downloader per video.
+
+All waits (latency, window, transfers, sleeps and the configured request
+rates) are multiplied by ``--time-scale`` so a run over many IDs finishes
+quickly; reported rates are unscaled:
+
+    python benchmark_s1.py --ids 2000 --workers 4 --output bench_s1.json
+    python benchmark_s1.py --ids 2000 --workers 4 --baseline bench_s1.json
+    python benchmark_s1.py --assets videos --ids 200 --video-workers 8
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+
+from yt_dlp.utils import DownloadError
+from youtube_transcript_api import FetchedTranscript, FetchedTranscriptSnippet, RequestBlocked
+from youtube_transcript_api.formatters import JSONFormatter
+
+import conf as c
+
+
+class FakeTranscriptService:
+    """Shared server-side state of the fake transcript API: latency and rate-based blocking."""
+
+    def __init__(self, latency, max_rate, window):
+        self.latency = latency
+        self.max_rate = max_rate
+        self.window = window
+        self.requests = 0
+        self.blocked = 0
+        self.clients = 0
+        self._arrivals = deque()
+        self._lock = threading.Lock()
+
+    def client(self):
+        """A new client, the equivalent of a YouTubeTranscriptApi with its own HTTP session."""
+        with self._lock:
+            self.clients += 1
+        return FakeTranscriptClient(self)
+
+    def request(self, video_id):
+        with self._lock:
+            now = time.monotonic()
+            while self._arrivals and self._arrivals[0] <= now - self.window:
+                self._arrivals.popleft()
+            self._arrivals.append(now)
+            self.requests += 1
+            blocked = len(self._arrivals) > self.max_rate * self.window
+            if blocked:
+                self.blocked += 1
+        time.sleep(self.latency)
+        if blocked:
+            raise RequestBlocked(video_id)
+        snippets = [FetchedTranscriptSnippet(text=f"{video_id} caption {index}", start=index * 2.0, duration=1.5)
+                    for index in range(20)]
+        return FetchedTranscript(snippets, video_id, "English", "en", False)
+
+
+class FakeTranscriptClient:
+    def __init__(self, service):
+        self.service = service
+
+    def fetch(self, video_id, languages=("en",)):
+        return self.service.request(video_id)
+
+
+def reference_download_transcripts(video_ids, client, transcript_dir, time_scale):
+    """The original s1 loop: one request at a time with a sleep before each. Returns failures."""
+    formatter = JSONFormatter()
+    sleep_time = 1
+    errors = 0
+    for video_id in video_ids:
+        sleep_time = min(sleep_time, 2)
+        time.sleep(sleep_time * time_scale)
+        try:
+            transcript = client.fetch(video_id)
+        except RequestBlocked:
+            sleep_time = min(sleep_time + 0.1, 5)
+            errors += 1
+            continue
+        with open(os.path.join(transcript_dir, f"{video_id}.json"), "w", encoding="utf-8") as out_file:
+            out_file.write(formatter.format_transcript(transcript))
+    return errors
+
+
+class FakeLink:
+    """Shared network link: concurrent transfers split `rate` bytes/s, each capped at its own limit."""
+
+    def __init__(self, rate, time_scale):
+        self.rate = rate
+        self.time_scale = time_scale
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def transfer(self, size, limit, progress, chunk=1 << 20):
+        """Send `size` bytes, calling progress(bytes so far) after every chunk."""
+        with self._lock:
+            self.active += 1
+        try:
+            done = 0
+            while done < size:
+                step = min(chunk, size - done)
+                with self._lock:
+                    rate = min(limit, self.rate / self.active)
+                time.sleep(step / rate * self.time_scale)
+                done += step
+                progress(done)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class FakeDownloader:
+    """Stand-in for YoutubeDL: setup cost, metadata latency, then a transfer reported through progress hooks."""
+
+    instances = 0
+    _lock = threading.Lock()
+
+    def __init__(self, options, link, args):
+        with FakeDownloader._lock:
+            FakeDownloader.instances += 1
+        self.hooks = options.get("progress_hooks", [])
+        self.link = link
+        self.args = args
+        time.sleep(args.setup_seconds * args.time_scale)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def extract_info(self, url):
+        video_id = url.rsplit("=", 1)[-1]
+        index = int(video_id[len("bench"):])
+        time.sleep(self.args.extract_latency * self.args.time_scale)
+        if index % 50 == 49:
+            raise DownloadError(f"{video_id}: Video unavailable")
+        size = int(self.args.video_mb * 1e6 * (0.5 + (index * 7919 % 100) / 100))
+        filename = f"{video_id}.mp4"
+
+        def progress(done):
+            for hook in self.hooks:
+                hook({"status": "downloading", "filename": filename, "downloaded_bytes": done, "total_bytes": size})
+
+        self.link.transfer(size, self.args.limit_rate * 1e6, progress)
+        for hook in self.hooks:
+            hook({"status": "finished", "filename": filename, "downloaded_bytes": size, "total_bytes": size})
+        return {"id": video_id, "filesize": size}
+
+
+def reference_download_videos(video_ids, make_downloader, time_scale):
+    """The original s1 loop: one video at a time, a new downloader per video. Returns (failures, bytes)."""
+    received = {}
+    options = {"progress_hooks": [lambda status: received.__setitem__(status["filename"], status["downloaded_bytes"])]}
+    errors = 0
+    for video_id in video_ids:
+        time.sleep(0.2 * time_scale)
+        try:
+            with make_downloader(options) as yt:
+                yt.extract_info(f"https://www.youtube.com/watch?v={video_id}")
+        except DownloadError:
+            errors += 1
+    return errors, sum(received.values())
+
+
+def make_service(args):
+    return FakeTranscriptService(
+        latency=args.latency * args.time_scale,
+        max_rate=args.max_rate / args.time_scale,
+        window=args.window * args.time_scale,
+    )
+
+
+def run_transcripts(s1, args, video_ids, workdir):
+    """Fetch transcripts with download_transcripts and the original loop; return their results."""
+    for name in ("TRANSCRIPT_RATE", "TRANSCRIPT_MIN_RATE", "TRANSCRIPT_MAX_RATE", "TRANSCRIPT_RATE_INCREASE"):
+        setattr(c, name, getattr(c, name) / args.time_scale)
+
+    service = make_service(args)
+    started = time.perf_counter()
+    s1.download_transcripts(client_factory=service.client, workers=args.workers)
+    current_seconds = time.perf_counter() - started
+    saved = len(s1.get_existing_ids(c.TRANSCRIPT_DIR, "json"))
+    current = {"service": service, "seconds": current_seconds, "saved": saved}
+
+    reference_dir = os.path.join(workdir, "reference")
+    os.makedirs(reference_dir, exist_ok=True)
+    service = make_service(args)
+    started = time.perf_counter()
+    errors = reference_download_transcripts(video_ids, service.client(), reference_dir, args.time_scale)
+    reference = {"service": service, "seconds": time.perf_counter() - started, "saved": len(video_ids) - errors}
+
+    results = {
+        name: {
+            "seconds": run["seconds"] / args.time_scale,
+            "transcripts_per_second": run["saved"] * args.time_scale / run["seconds"],
+            "saved": run["saved"],
+            "requests": run["service"].requests,
+            "blocked": run["service"].blocked,
+            "clients": run["service"].clients,
+        }
+        for name, run in (("reference", reference), ("current", current))
+    }
+
+    print(f"{len(video_ids)} IDs, service blocks above {args.max_rate} requests/s over {args.window}s")
+    for name, result in results.items():
+        print(
+            f"{name:>10}: {result['transcripts_per_second']:6.2f} transcripts/s, {result['saved']} saved, "
+            f"{result['requests']} requests, {result['blocked']} blocked, {result['clients']} clients "
+            f"({result['seconds']:.0f}s unscaled)"
+        )
+    speedup = results["current"]["transcripts_per_second"] / results["reference"]["transcripts_per_second"]
+    print(f"speedup: {speedup:.2f}x")
+    return results
+
+
+def run_videos(s1, args, video_ids):
+    """Download videos with download_videos and the original loop; return their results."""
+    c.VIDEO_REPORT_INTERVAL *= args.time_scale
+    c.VIDEO_DOWNLOAD_PAUSE *= args.time_scale
+    runs = {}
+
+    FakeDownloader.instances = 0
+    link = FakeLink(args.link_rate * 1e6, args.time_scale)
+    started = time.perf_counter()
+    summary = s1.download_videos(
+        downloader_factory=lambda options: FakeDownloader(options, link, args), workers=args.video_workers
+    )
+    seconds = time.perf_counter() - started
+    runs["current"] = (seconds, summary["errors"], summary["bytes"], FakeDownloader.instances)
+
+    FakeDownloader.instances = 0
+    link = FakeLink(args.link_rate * 1e6, args.time_scale)
+    started = time.perf_counter()
+    errors, received = reference_download_videos(
+        video_ids, lambda options: FakeDownloader(options, link, args), args.time_scale
+    )
+    runs["reference"] = (time.perf_counter() - started, errors, received, FakeDownloader.instances)
+
+    results = {
+        name: {
+            "seconds": seconds / args.time_scale,
+            "videos_per_second": (len(video_ids) - errors) * args.time_scale / seconds,
+            "mb_per_second": received / 1e6 * args.time_scale / seconds,
+            "errors": errors,
+            "downloaders": instances,
+        }
+        for name, (seconds, errors, received, instances) in sorted(runs.items(), reverse=True)
+    }
+
+    print(
+        f"{len(video_ids)} videos of ~{args.video_mb} MB, {args.limit_rate} MB/s per download, "
+        f"{args.link_rate} MB/s link"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:>10}: {result['videos_per_second']:6.2f} videos/s, {result['mb_per_second']:6.1f} MB/s, "
+            f"{result['errors']} errors, {result['downloaders']} downloaders ({result['seconds']:.0f}s unscaled)"
+        )
+    speedup = results["current"]["videos_per_second"] / results["reference"]["videos_per_second"]
+    print(f"speedup: {speedup:.2f}x")
+    return results
+
+
+def run(args):
+    import s1_YouTube_downloader as s1
+
+    logging.getLogger(s1.__name__).setLevel(logging.WARNING)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="s1_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    video_ids = [f"bench{index:07d}" for index in range(args.ids)]
+    id_file = os.path.join(workdir, "ids.txt")
+    with open(id_file, "w", encoding="utf-8") as out_file:
+        out_file.write("\n".join(video_ids) + "\n")
+
+    c.ID = id_file
+    c.TRANSCRIPT_DIR = os.path.join(workdir, "transcript", "")
+    c.VIDEO_DIR = os.path.join(workdir, "origin", "")
+    c.NPY_DIR = os.path.join(workdir, "npy", "")
+    c.LEDGER_PATH = os.path.join(workdir, "ledger.sqlite3")
+    c.METRICS_DIR = None
+    for path in (c.TRANSCRIPT_DIR, c.LEDGER_PATH):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    results = {"config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "workdir")}}
+    if args.assets in ("transcripts", "all"):
+        results["transcripts"] = run_transcripts(s1, args, video_ids, workdir)
+    if args.assets in ("videos", "all"):
+        results["videos"] = run_videos(s1, args, video_ids)
+
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline):
+    """Print throughput of each measurement relative to a baseline run."""
+    print("\nComparison against baseline:")
+    for section, unit in (("transcripts", "transcripts_per_second"), ("videos", "videos_per_second")):
+        for name, result in results.get(section, {}).items():
+            previous = baseline.get(section, {}).get(name)
+            if not previous:
+                print(f"{section:>11} {name:>10}: no baseline")
+                continue
+            ratio = result[unit] / previous[unit]
+            print(
+                f"{section:>11} {name:>10}: {previous[unit]:6.2f} -> {result[unit]:6.2f} "
+                f"{section}/s ({ratio:.2f}x)"
+            )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark s1 transcript fetching and video downloads against fakes")
+    parser.add_argument("--assets", choices=["transcripts", "videos", "all"], default="all", help="What to benchmark")
+    parser.add_argument("--ids", type=int, default=500, help="Video IDs to fetch")
+    parser.add_argument("--time-scale", type=float, default=0.02, help="Factor applied to every wait")
+    transcripts = parser.add_argument_group("transcripts")
+    transcripts.add_argument("--workers", type=int, default=c.TRANSCRIPT_FETCH_WORKERS, help="Fetching threads")
+    transcripts.add_argument("--latency", type=float, default=0.4, help="Seconds per request of the fake service")
+    transcripts.add_argument("--max-rate", type=float, default=3.0, help="Requests/s above which the service blocks")
+    transcripts.add_argument(
+        "--window", type=float, default=10.0, help="Seconds over which the service measures the rate"
+    )
+    videos = parser.add_argument_group("videos")
+    videos.add_argument("--video-workers", type=int, default=c.VIDEO_DOWNLOAD_WORKERS, help="Download threads")
+    videos.add_argument("--video-mb", type=float, default=20.0, help="Average video size in MB")
+    videos.add_argument("--limit-rate", type=float, default=5.0, help="MB/s per download (YT_CONFIG limit_rate)")
+    videos.add_argument("--link-rate", type=float, default=40.0, help="MB/s of the shared link")
+    videos.add_argument("--setup-seconds", type=float, default=0.08, help="Seconds to construct a downloader")
+    videos.add_argument("--extract-latency", type=float, default=1.0, help="Seconds of metadata requests per video")
+    parser.add_argument("--workdir", help="Keep transcripts and the ledger in this directory")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against results JSON from an earlier run")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out_file:
+            json.dump(results, out_file, indent=2)
+        print(f"Saved results to {args.output}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as in_file:
+            compare(results, json.load(in_file))
+    return results
+
+
+if __name__ == "__main__":
+    main()
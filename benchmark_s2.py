@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""Synthetic benchmark for s2 transcript normalization and segmentation.
+
+Generates transcript JSON files with the awkward parts of real captions
+(typographic quotes, ellipses, bracketed sound cues, non-ASCII text, embedded
+newlines and tabs, over-long and too-short captions, entries with missing
+keys) and processes them twice:
+
+- the reference: the original per-caption ``normalize_text`` and pandas
+  append per transcript (kept below as ``reference_normalize_text`` and
+  ``reference_save_segments_to_csv``), one transcript after another in process;
+- ``s2_transcript_preprocess.main`` with batch normalization on its process
+  pool and a single CSV writer.
+
+The two CSV files must be byte-identical, and the columnar table written next
+to the CSV must hold the same values as the CSV. With incremental runs
+enabled, ``main`` is then run again (nothing may change) and once more after a
+top-up that rewrites some transcripts and adds new ones; the result must have
+the same rows as the reference run from scratch on the topped-up corpus. Normalization alone is also timed
+per caption and per batch. Results can be saved as JSON and compared against
+an earlier run:
+
+    python benchmark_s2.py --output bench_s2.json
+    python benchmark_s2.py --baseline bench_s2.json
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+import conf as c
+
+WORDS = [
+    "hello", "sign", "language", "today", "we", "will", "learn", "the", "alphabet", "and", "numbers",
+    "“quoted”", "it’s", "‘single’", "wait…", "dash—here", "café",
+    "中文", "\U0001F600", "[Music]", "[APPLAUSE]", "[laughs", "]", "a\nb", "c\r\nd", "tab\there",
+    "\x0bvt", "\x1cfs", " nbsp", " ls", "  ", "",
+]
+
+
+def reference_normalize_text(text):
+    """The original s2 normalize_text: mapping dict and regex rebuilt on every call."""
+    unicode_mappings = {
+        "“": '"',
+        "”": '"',
+        "—": "-",
+        "‘": "'",
+        "’": "'",
+        "…": "...",
+        "\n": " ",
+        "\r": " ",
+    }
+    pattern = re.compile("|".join(map(re.escape, unicode_mappings)))
+    text = pattern.sub(lambda match: unicode_mappings[match.group()], text)
+    text = re.sub(r"[^\x00-\x7F]+", "", text)
+    text = re.sub(r"\[.*?\]", "", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip()
+
+
+def reference_save_segments_to_csv(segment_data, csv_path):
+    """The original s2 save_segments_to_csv: one DataFrame and one file open per video."""
+    df = pd.DataFrame(segment_data)
+    mode = "a" if os.path.exists(csv_path) else "w"
+    header = not os.path.exists(csv_path)
+    df.to_csv(
+        csv_path,
+        sep="\t",
+        mode=mode,
+        header=header,
+        index=False,
+        encoding="utf-8",
+        quoting=csv.QUOTE_ALL,
+    )
+
+
+def make_transcript(rng, lines):
+    """Return a synthetic transcript (list of caption dicts) with `lines` captions."""
+    transcript = []
+    start = 0.0
+    for _ in range(lines):
+        length = rng.choice([0, 1, 3, 8, 15, 40, 90])
+        text = " ".join(rng.choice(WORDS) for _ in range(length))
+        duration = rng.choice([0.1, 0.2, 1.5, 2.37, 4.0, 59.9, 60.0, 75.0])
+        entry = {"text": text, "start": round(start, 3), "duration": duration}
+        if rng.random() < 0.02:
+            del entry[rng.choice(["text", "start", "duration"])]
+        elif rng.random() < 0.05:
+            entry["start"], entry["duration"] = int(start), rng.choice([1, 2, 3])
+        transcript.append(entry)
+        start += rng.uniform(0.5, 5.0)
+    return transcript
+
+
+def make_corpus(workdir, transcripts, lines, seed):
+    """Write synthetic transcripts and a video ID list; return (id_file, transcript_dir, captions)."""
+    rng = random.Random(seed)
+    transcript_dir = os.path.join(workdir, "transcript")
+    os.makedirs(transcript_dir, exist_ok=True)
+    video_ids = []
+    captions = 0
+    for index in range(transcripts):
+        video_id = f"bench-{index:06d}"
+        transcript = make_transcript(rng, rng.randint(lines // 2, lines * 3 // 2))
+        if index % 50 == 7:
+            transcript = []
+        with open(os.path.join(transcript_dir, f"{video_id}.json"), "w", encoding="utf-8") as out_file:
+            json.dump(transcript, out_file, ensure_ascii=rng.random() < 0.5)
+        video_ids.append(video_id)
+        captions += len(transcript)
+    video_ids.append("bench-missing")
+    id_file = os.path.join(workdir, "ids.txt")
+    with open(id_file, "w", encoding="utf-8") as out_file:
+        out_file.write("\n".join(video_ids) + "\n")
+    return id_file, transcript_dir, captions
+
+
+def top_up_corpus(workdir, lines, seed, changed_every, added):
+    """Rewrite every `changed_every`-th transcript and add `added` new ones; return the count of both."""
+    rng = random.Random(seed + 1)
+    transcript_dir = os.path.join(workdir, "transcript")
+    id_file = os.path.join(workdir, "ids.txt")
+    with open(id_file, "r", encoding="utf-8") as file:
+        video_ids = [line.strip() for line in file if line.strip()]
+    changed = [
+        video_id for index, video_id in enumerate(video_ids)
+        if index % changed_every == changed_every // 2 and os.path.exists(os.path.join(transcript_dir, f"{video_id}.json"))
+    ]
+    new_ids = [f"bench-new-{index:06d}" for index in range(added)]
+    for video_id in changed + new_ids:
+        with open(os.path.join(transcript_dir, f"{video_id}.json"), "w", encoding="utf-8") as out_file:
+            json.dump(make_transcript(rng, rng.randint(lines // 2, lines * 3 // 2)), out_file)
+    with open(id_file, "a", encoding="utf-8") as out_file:
+        out_file.write("".join(f"{video_id}\n" for video_id in new_ids))
+    return len(changed) + len(new_ids)
+
+
+def same_rows(path, other_path):
+    """True if two CSV files have the same header and the same rows in any order."""
+    with open(path, "r", encoding="utf-8") as file, open(other_path, "r", encoding="utf-8") as other_file:
+        lines, other_lines = file.readlines(), other_file.readlines()
+    return lines[:1] == other_lines[:1] and sorted(lines[1:]) == sorted(other_lines[1:])
+
+
+def run_incremental(s2, args, workdir, current_csv):
+    """Time a no-op rerun and a top-up run of main; return (results, output correct)."""
+    with open(current_csv, "rb") as current_file:
+        before = current_file.read()
+    started = time.perf_counter()
+    s2.main()
+    rerun_seconds = time.perf_counter() - started
+    with open(current_csv, "rb") as current_file:
+        correct = current_file.read() == before
+
+    topped_up = top_up_corpus(workdir, args.lines, args.seed, 20, max(args.transcripts // 20, 1))
+    started = time.perf_counter()
+    s2.main()
+    top_up_seconds = time.perf_counter() - started
+
+    reference_csv = os.path.join(workdir, "reference_top_up.csv")
+    run_reference(s2, c.ID, reference_csv)
+    correct = correct and same_rows(reference_csv, current_csv)
+    if correct and c.SEGMENT_TABLE:
+        correct = table_matches_csv(current_csv)
+
+    results = {
+        "rerun": {"seconds": rerun_seconds, "transcripts": 0},
+        "top_up": {"seconds": top_up_seconds, "transcripts": topped_up},
+    }
+    print(f"incremental rerun and top-up of {topped_up} transcripts correct: {correct}")
+    for name, result in results.items():
+        print(f"incremental {name:>20}: {result['transcripts']:6d} transcripts in {result['seconds']:.2f}s")
+    return results, correct
+
+
+def run_reference(s2, id_file, csv_path):
+    """Serial run of the original pipeline: per-caption normalization and a pandas append per transcript."""
+    batch = s2.normalize_texts
+    s2.normalize_texts = lambda texts: [reference_normalize_text(text) for text in texts]
+    try:
+        with open(id_file, "r", encoding="utf-8") as file:
+            video_ids = [line.strip() for line in file if line.strip()]
+        for video_id in video_ids:
+            segments = s2.process_video_transcript(video_id)
+            if segments:
+                reference_save_segments_to_csv(segments, csv_path)
+    finally:
+        s2.normalize_texts = batch
+
+
+def time_normalization(s2, texts, batch_size):
+    """Seconds to normalize `texts` per caption (reference and current) and in batches of `batch_size`."""
+    timings = {}
+    started = time.perf_counter()
+    reference = [reference_normalize_text(text) for text in texts]
+    timings["reference_per_caption"] = time.perf_counter() - started
+    started = time.perf_counter()
+    single = [s2.normalize_text(text) for text in texts]
+    timings["per_caption"] = time.perf_counter() - started
+    started = time.perf_counter()
+    batch = [
+        text for index in range(0, len(texts), batch_size) for text in s2.normalize_texts(texts[index:index + batch_size])
+    ]
+    timings["batch"] = time.perf_counter() - started
+    if not reference == single == batch:
+        raise AssertionError("normalize_text/normalize_texts differ from the reference")
+    return timings
+
+
+def table_matches_csv(csv_path):
+    """True if the columnar table of `csv_path` loads the same as parsing the CSV."""
+    import segment_table
+
+    columns = segment_table.segment_columns(csv_path)
+    parsed = pd.read_csv(
+        csv_path,
+        delimiter="\t",
+        on_bad_lines="skip",
+        dtype={name: str for name in segment_table.STRING_COLUMNS},
+    )
+    table = segment_table.load_segment_columns(csv_path, columns)
+    try:
+        pd.testing.assert_frame_equal(parsed, table, check_dtype=False)
+    except AssertionError as error:
+        print(f"columnar table differs from the CSV: {error}")
+        return False
+    return True
+
+
+def run(args):
+    import s2_transcript_preprocess as s2
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="s2_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    id_file, transcript_dir, captions = make_corpus(workdir, args.transcripts, args.lines, args.seed)
+    c.ID = id_file
+    c.TRANSCRIPT_DIR = transcript_dir
+    c.TRANSCRIPT_WORKERS = args.workers
+    c.LEDGER_PATH = os.path.join(workdir, "ledger.sqlite3")
+
+    rng = random.Random(args.seed)
+    texts = [entry["text"] for entry in make_transcript(rng, args.normalize_lines) if "text" in entry]
+    normalization = time_normalization(s2, texts, args.lines)
+
+    reference_csv = os.path.join(workdir, "reference.csv")
+    current_csv = os.path.join(workdir, "current.csv")
+    for path in (reference_csv, current_csv, c.LEDGER_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+    started = time.perf_counter()
+    run_reference(s2, id_file, reference_csv)
+    reference_seconds = time.perf_counter() - started
+
+    c.CSV_FILE = current_csv
+    started = time.perf_counter()
+    s2.main()
+    current_seconds = time.perf_counter() - started
+
+    with open(reference_csv, "rb") as reference_file, open(current_csv, "rb") as current_file:
+        identical = reference_file.read() == current_file.read()
+    if identical and c.SEGMENT_TABLE:
+        identical = table_matches_csv(current_csv)
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "workdir")},
+        "captions": captions,
+        "identical": identical,
+        "normalization": {
+            name: {"seconds": seconds, "captions_per_second": len(texts) / seconds}
+            for name, seconds in normalization.items()
+        },
+        "pipeline": {
+            name: {
+                "seconds": seconds,
+                "transcripts_per_second": args.transcripts / seconds,
+                "captions_per_second": captions / seconds,
+            }
+            for name, seconds in (("reference", reference_seconds), ("main", current_seconds))
+        },
+    }
+
+    print(f"{args.transcripts} transcripts, {captions} captions, output identical: {identical}")
+    for name, result in results["normalization"].items():
+        print(f"normalize {name:>22}: {result['captions_per_second']:12.0f} captions/s")
+    for name, result in results["pipeline"].items():
+        print(
+            f"pipeline  {name:>22}: {result['transcripts_per_second']:12.1f} transcripts/s "
+            f"{result['captions_per_second']:10.0f} captions/s ({result['seconds']:.2f}s)"
+        )
+
+    incremental_correct = True
+    if identical and c.TRANSCRIPT_INCREMENTAL:
+        results["incremental"], incremental_correct = run_incremental(s2, args, workdir, current_csv)
+        results["incremental_correct"] = incremental_correct
+
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if not identical:
+        raise SystemExit("s2 output differs from the reference implementation")
+    if not incremental_correct:
+        raise SystemExit("incremental s2 output differs from the reference implementation")
+    return results
+
+
+def compare(results, baseline):
+    """Print captions/s of each measurement relative to a baseline run."""
+    print("\nComparison against baseline (captions/s):")
+    for section in ("normalization", "pipeline"):
+        for name, result in results[section].items():
+            previous = baseline.get(section, {}).get(name)
+            if not previous:
+                print(f"{section:>13} {name:>22}: no baseline")
+                continue
+            ratio = result["captions_per_second"] / previous["captions_per_second"]
+            print(
+                f"{section:>13} {name:>22}: {previous['captions_per_second']:10.0f} -> "
+                f"{result['captions_per_second']:10.0f} ({ratio:.2f}x)"
+            )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark s2 transcript processing on synthetic transcripts")
+    parser.add_argument("--transcripts", type=int, default=2000, help="Synthetic transcript files")
+    parser.add_argument("--lines", type=int, default=120, help="Average captions per transcript")
+    parser.add_argument("--normalize-lines", type=int, default=200000, help="Captions for the normalization timing")
+    parser.add_argument("--workers", type=int, default=c.TRANSCRIPT_WORKERS, help="Set conf.TRANSCRIPT_WORKERS")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Keep transcripts and outputs in this directory")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against results JSON from an earlier run")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out_file:
+            json.dump(results, out_file, indent=2)
+        print(f"Saved results to {args.output}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as in_file:
+            compare(results, json.load(in_file))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""Synthetic benchmark for the s3 landmark extraction hot path.
+
+Generates mp4 clips locally with ``cv2.VideoWriter`` at several resolutions and
+frame rates, writes a matching timestamp CSV, and times
+``s3_mediapipe_labelling.process_video`` (one worker, in process) and
+``s3_mediapipe_labelling.main`` (full pool) against them. By default the
+Holistic model is replaced with a stand-in that sleeps for a configurable
+latency and returns fixed landmarks; ``--real-model`` uses MediaPipe instead.
+
+Results (frames/s, segments/s, peak RSS and per-stage seconds) are printed and
+can be saved as JSON and compared against an earlier run. ``--max-side``,
+``--signer-crop`` and ``--motion-threshold`` also run a reference pass with
+those options off and report the landmark deviation from it; that comparison
+is only meaningful with ``--real-model``:
+
+    python benchmark_s3.py --output bench.json
+    python benchmark_s3.py --baseline bench.json
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import tempfile
+import time
+from glob import glob
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+import conf as c
+from job_ledger import close_ledgers
+from landmark_store import close_stores
+
+logger = logging.getLogger(__name__)
+
+
+class FakeLandmark:
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x, y, z):
+        self.x, self.y, self.z = x, y, z
+
+
+class FakeHolistic:
+    """Stand-in for mp.solutions.holistic.Holistic with a fixed latency."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        part = lambda n: SimpleNamespace(landmark=[FakeLandmark(0.5, 0.5, 0.0) for _ in range(n)])
+        self._results = SimpleNamespace(
+            pose_landmarks=part(33),
+            face_landmarks=part(478),
+            left_hand_landmarks=part(21),
+            right_hand_landmarks=None,
+        )
+
+    def process(self, image):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self._results
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_clip(path, width, height, fps, duration, seed=0, static_fraction=0.0):
+    """
+    Write a synthetic clip whose content changes every frame, except that the
+    first `static_fraction` of every second is frozen.
+    """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    rng = np.random.default_rng(seed)
+    texture = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    shift = 0
+    for i in range(int(round(fps * duration))):
+        if (i % round(fps)) >= static_fraction * fps:
+            shift += 4
+        writer.write(np.roll(texture, shift, axis=1))
+    writer.release()
+    return path
+
+
+def make_segments(video_name, duration, n_segments, segment_length):
+    """Evenly spaced caption windows covering the clip."""
+    starts = np.linspace(0.0, max(duration - segment_length, 0.0), n_segments)
+    return [
+        (video_name, f"{video_name}-{i:03d}", round(float(start), 3), round(float(start) + segment_length, 3))
+        for i, start in enumerate(starts)
+    ]
+
+
+def write_timestamp_csv(path, rows):
+    with open(path, "w", encoding="utf-8") as csv_file:
+        csv_file.write("VIDEO_NAME\tSENTENCE_NAME\tSTART_REALIGNED\tEND_REALIGNED\tSENTENCE\n")
+        for video_name, sentence_name, start, end in rows:
+            csv_file.write(f"{video_name}\t{sentence_name}\t{start}\t{end}\tbenchmark\n")
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def configure(workdir, csv_path):
+    """Point the pipeline configuration at the benchmark working directory."""
+    c.VIDEO_DIR = os.path.join(workdir, "videos") + os.sep
+    c.NPY_DIR = os.path.join(workdir, "npy") + os.sep
+    c.CSV_FILE = csv_path
+    c.LEDGER_PATH = os.path.join(workdir, "ledger.sqlite3")
+    c.METRICS_DIR = os.path.join(workdir, "metrics") + os.sep
+    c.PROBE_CACHE_PATH = os.path.join(workdir, "video_probe.sqlite3")
+
+
+def reset_outputs(workdir):
+    close_ledgers()
+    close_stores()
+    shutil.rmtree(os.path.join(workdir, "npy"), ignore_errors=True)
+    for suffix in ("", "-wal", "-shm"):
+        path = os.path.join(workdir, "ledger.sqlite3" + suffix)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def install_fake_model(s3, latency):
+    """Make s3 (and the pool workers it forks) build the fake Holistic model."""
+    s3.create_holistic_model = lambda: FakeHolistic(latency)
+    s3._HOLISTIC = None
+
+
+def bench_process_video(s3, video_path, segments, n_segments):
+    started = time.perf_counter()
+    stats = s3.process_video(video_path, segments)
+    wall = time.perf_counter() - started
+    return {
+        "wall_seconds": wall,
+        "frames_per_second": stats["frames_inferred"] / wall,
+        "segments_per_second": n_segments / wall,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stats,
+    }
+
+
+def landmark_deviation(reference_dir, candidate_dir, width, height):
+    """
+    Mean and 95th percentile pixel distance between matching landmarks of two
+    runs, over landmarks detected in both, plus the fraction of landmarks whose
+    detection state differs.
+    """
+    distances = []
+    mismatched = total = 0
+    for path in sorted(glob(os.path.join(reference_dir, "*.npy"))):
+        candidate_path = os.path.join(candidate_dir, os.path.basename(path))
+        if not os.path.exists(candidate_path):
+            continue
+        reference = np.load(path).reshape(-1, 3)
+        candidate = np.load(candidate_path).reshape(-1, 3)
+        rows = min(len(reference), len(candidate))
+        reference, candidate = reference[:rows], candidate[:rows]
+        found_ref, found_cand = reference.any(axis=1), candidate.any(axis=1)
+        both = found_ref & found_cand
+        mismatched += int(np.count_nonzero(found_ref != found_cand))
+        total += rows
+        delta = (reference[both, :2] - candidate[both, :2]) * (width, height)
+        distances.append(np.hypot(delta[:, 0], delta[:, 1]))
+    distances = np.concatenate(distances) if distances else np.zeros(0)
+    return {
+        "mean_px": float(distances.mean()) if distances.size else 0.0,
+        "p95_px": float(np.percentile(distances, 95)) if distances.size else 0.0,
+        "detection_mismatch": mismatched / total if total else 0.0,
+    }
+
+
+def bench_main(s3, n_segments):
+    started = time.perf_counter()
+    totals = s3.main([])
+    wall = time.perf_counter() - started
+    return {
+        "wall_seconds": wall,
+        "frames_per_second": totals["frames_inferred"] / wall,
+        "segments_per_second": n_segments / wall,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_worker_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+        "stages": totals,
+    }
+
+
+def run(args):
+    import s3_mediapipe_labelling as s3
+
+    # s3 configures conf.LOG_LEVEL logging on import; keep the benchmark output readable
+    logging.getLogger().setLevel(logging.WARNING)
+    if not args.real_model:
+        install_fake_model(s3, args.latency_ms / 1000)
+    c.EXTRACT_FPS = args.extract_fps
+    c.INFERENCE_MAX_SIDE = args.max_side
+    c.SIGNER_CROP = args.signer_crop
+    c.MOTION_GATE_THRESHOLD = args.motion_threshold
+    preprocessed = bool(args.max_side or args.signer_crop or args.motion_threshold is not None)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="s3_bench_")
+    os.makedirs(os.path.join(workdir, "videos"), exist_ok=True)
+    results = {
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "baseline", "workdir")
+        },
+        "cases": {},
+    }
+
+    for resolution in args.resolutions:
+        width, height = map(int, resolution.lower().split("x"))
+        for fps in args.fps:
+            case = f"{width}x{height}@{fps:g}"
+            video_name = f"bench_{width}x{height}_{fps:g}"
+            if args.static_fraction:
+                video_name += f"_static{args.static_fraction:g}"
+            video_path = os.path.join(workdir, "videos", f"{video_name}.mp4")
+            if not os.path.exists(video_path):
+                make_clip(video_path, width, height, fps, args.duration, static_fraction=args.static_fraction)
+            rows = make_segments(video_name, args.duration, args.segments, args.segment_length)
+            csv_path = os.path.join(workdir, f"{video_name}.csv")
+            write_timestamp_csv(csv_path, rows)
+            configure(workdir, csv_path)
+
+            case_results = {}
+            if args.mode in ("video", "both"):
+                reset_outputs(workdir)
+                segments = [
+                    (start, end, os.path.join(c.NPY_DIR, f"{sentence_name}.npy"))
+                    for _, sentence_name, start, end in rows
+                ]
+                case_results["process_video"] = bench_process_video(s3, video_path, segments, len(rows))
+                if preprocessed:
+                    # Reference run without preprocessing for the accuracy comparison
+                    reference_dir = os.path.join(workdir, "npy_reference")
+                    shutil.rmtree(reference_dir, ignore_errors=True)
+                    c.INFERENCE_MAX_SIDE, c.SIGNER_CROP, c.MOTION_GATE_THRESHOLD = None, False, None
+                    reference = bench_process_video(
+                        s3, video_path,
+                        [(start, end, os.path.join(reference_dir, os.path.basename(path)))
+                         for start, end, path in segments],
+                        len(rows),
+                    )
+                    c.INFERENCE_MAX_SIDE, c.SIGNER_CROP = args.max_side, args.signer_crop
+                    c.MOTION_GATE_THRESHOLD = args.motion_threshold
+                    case_results["process_video"]["reference_frames_per_second"] = reference["frames_per_second"]
+                    case_results["process_video"]["reference_segments_per_second"] = reference["segments_per_second"]
+                    case_results["process_video"]["deviation"] = landmark_deviation(
+                        reference_dir, c.NPY_DIR, width, height
+                    )
+            if args.mode in ("main", "both"):
+                reset_outputs(workdir)
+                case_results["main"] = bench_main(s3, len(rows))
+
+            results["cases"][case] = case_results
+            for target, result in case_results.items():
+                print(
+                    f"{case:>16} {target:>13}: {result['frames_per_second']:8.1f} frames/s "
+                    f"{result['segments_per_second']:7.2f} segments/s "
+                    f"peak RSS {result['peak_rss_mb']:7.1f} MB"
+                )
+                if "deviation" in result:
+                    deviation = result["deviation"]
+                    print(
+                        " " * 32
+                        + f"reference {result['reference_frames_per_second']:.1f} frames/s "
+                        f"{result['reference_segments_per_second']:.2f} segments/s; "
+                        f"landmark deviation mean {deviation['mean_px']:.2f} px, "
+                        f"p95 {deviation['p95_px']:.2f} px, "
+                        f"detection mismatch {100 * deviation['detection_mismatch']:.1f}%"
+                    )
+                stages = result["stages"]
+                print(
+                    " " * 32
+                    + ", ".join(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+                                for key, value in stages.items())
+                )
+
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline):
+    """Print frames/s of each case relative to a baseline run."""
+    print("\nComparison against baseline (frames/s):")
+    for case, targets in results["cases"].items():
+        for target, result in targets.items():
+            previous = baseline.get("cases", {}).get(case, {}).get(target)
+            if not previous or not previous["frames_per_second"]:
+                print(f"{case:>16} {target:>13}: no baseline")
+                continue
+            ratio = result["frames_per_second"] / previous["frames_per_second"]
+            print(
+                f"{case:>16} {target:>13}: {previous['frames_per_second']:8.1f} -> "
+                f"{result['frames_per_second']:8.1f} ({ratio:.2f}x)"
+            )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark s3 landmark extraction on synthetic clips")
+    parser.add_argument("--mode", choices=["video", "main", "both"], default="both")
+    parser.add_argument("--resolutions", nargs="+", default=["640x360", "1280x720"])
+    parser.add_argument("--fps", nargs="+", type=float, default=[25.0, 30.0])
+    parser.add_argument("--duration", type=float, default=20.0, help="Clip length in seconds")
+    parser.add_argument("--segments", type=int, default=10, help="Caption segments per clip")
+    parser.add_argument("--segment-length", type=float, default=3.0, help="Segment length in seconds")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Fake model latency per frame")
+    parser.add_argument("--extract-fps", type=float, help="Set conf.EXTRACT_FPS (sample at this rate in s3)")
+    parser.add_argument("--max-side", type=int, help="Set conf.INFERENCE_MAX_SIDE (compared to a run without it)")
+    parser.add_argument("--signer-crop", action="store_true", help="Set conf.SIGNER_CROP (compared to a run without it)")
+    parser.add_argument("--motion-threshold", type=float, help="Set conf.MOTION_GATE_THRESHOLD (compared to no gate)")
+    parser.add_argument("--static-fraction", type=float, default=0.0,
+                        help="Fraction of every second during which the synthetic clip is frozen")
+    parser.add_argument("--real-model", action="store_true", help="Use MediaPipe Holistic instead of the fake")
+    parser.add_argument("--workdir", help="Keep clips and outputs in this directory")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against results JSON from an earlier run")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out_file:
+            json.dump(results, out_file, indent=2)
+        print(f"Saved results to {args.output}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as in_file:
+            compare(results, json.load(in_file))
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -2,22 +2,33 @@
 """Report dataset coverage between CSV entries and ID list."""
 from __future__ import annotations
 
-import csv
+import argparse
 from pathlib import Path
 
+import conf as c
+import segment_table
+from landmark_store import STORE_TYPES, list_landmarks
+
 
 ROOT = Path(__file__).parent
 CSV_PATH = ROOT / "youtube_asl.csv"
 IDS_PATH = ROOT / "youtube-asl_youtube_asl_video_ids.txt"
 
 
+def load_csv_column(csv_path: Path, field: str) -> set[str]:
+    """Distinct non-empty values of a column, from the columnar table if current."""
+    if field not in segment_table.segment_columns(str(csv_path)):
+        raise ValueError(f"Expected column '{field}' in {csv_path}")
+    values = segment_table.load_segment_columns(str(csv_path), [field])[field].dropna()
+    return {value.strip() for value in values if value}
+
+
 def load_csv_video_ids(csv_path: Path) -> set[str]:
-    with csv_path.open("r", encoding="utf-8", newline="") as csv_file:
-        reader = csv.DictReader(csv_file, delimiter="\t")
-        field = "VIDEO_NAME"
-        if field not in reader.fieldnames:
-            raise ValueError(f"Expected column '{field}' in {csv_path}")
-        return {row[field].strip() for row in reader if row.get(field)}
+    return load_csv_column(csv_path, "VIDEO_NAME")
+
+
+def load_csv_sentence_names(csv_path: Path) -> set[str]:
+    return load_csv_column(csv_path, "SENTENCE_NAME")
 
 
 def load_txt_ids(txt_path: Path) -> set[str]:
@@ -25,7 +36,35 @@ def load_txt_ids(txt_path: Path) -> set[str]:
         return {line.strip() for line in txt_file if line.strip()}
 
 
-def main() -> None:
+def report_landmark_coverage(csv_path: Path, landmark_dir: str, fmt: str) -> None:
+    sentence_names = load_csv_sentence_names(csv_path)
+    stored_names = list_landmarks(landmark_dir, fmt)
+    missing = sentence_names - stored_names
+
+    print(f"CSV sentences with landmarks ({fmt} in {landmark_dir}): "
+          f"{len(sentence_names) - len(missing)}/{len(sentence_names)}")
+    print(f"Landmark arrays not referenced by CSV: {len(stored_names - sentence_names)}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--landmarks",
+        action="store_true",
+        help="Also report which CSV sentences have extracted landmarks",
+    )
+    parser.add_argument("--landmark-dir", default=c.NPY_DIR, help="Landmark store directory")
+    parser.add_argument(
+        "--format",
+        choices=sorted(STORE_TYPES),
+        default=c.OUTPUT_FORMAT,
+        help="Layout of the landmark store",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
     csv_ids = load_csv_video_ids(CSV_PATH)
     txt_ids = load_txt_ids(IDS_PATH)
 
@@ -49,6 +88,9 @@ def main() -> None:
     else:
         print("No extra IDs in CSV.")
 
+    if args.landmarks:
+        report_landmark_coverage(CSV_PATH, args.landmark_dir, args.format)
+
 
 if __name__ == "__main__":  # pragma: no cover
     main()
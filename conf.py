@@ -9,10 +9,16 @@ ROOT = os.path.dirname(os.path.abspath(__file__))
 VIDEO_DIR = f"{ROOT}/dataset/origin/"
 NPY_DIR = f"{ROOT}/dataset/npy/"
 TRANSCRIPT_DIR = f"{ROOT}/dataset/transcript/"
+LEDGER_PATH = f"{ROOT}/dataset/ledger.sqlite3"  # SQLite job ledger shared by all stages
+PROBE_CACHE_PATH = f"{ROOT}/dataset/video_probe.sqlite3"  # Cached fps/frame count/resolution per video
+METRICS_DIR = f"{ROOT}/dataset/metrics/"  # Per-stage metrics snapshots (None disables export)
 
 # Dataset files
 ID = "youtube-asl_youtube_asl_video_ids.txt"
 CSV_FILE = f"youtube_asl.csv"
+SEGMENT_TABLE = True  # Step 2 also writes CSV_FILE as a columnar .npz table that later steps load instead of the CSV
+TRANSCRIPT_INCREMENTAL = True  # Step 2 only segments new or changed transcripts and replaces their rows in CSV_FILE; False re-appends every transcript
+TRANSCRIPT_FINGERPRINT = "stat"  # How Step 2 detects changed transcripts: "stat" (size and mtime, confirmed by content hash) or "sha1" (content hash only)
 
 # =============================================================================
 # PROCESSING CONFIGURATION
@@ -20,12 +26,57 @@ CSV_FILE = f"youtube_asl.csv"
 
 # Frame processing
 FRAME_SKIP = 2  # Number of frames to skip when extracting frames from a video
+SAMPLING_MODE = "frame"  # "frame" counts frames; "timestamp" samples by container timestamps (variable frame rate)
+PROBE_WORKERS = 8  # Videos probed concurrently when filling the probe cache
+INFERENCE_MAX_SIDE = None  # Downscale frames so the longer side is at most this many pixels before inference (e.g. 640)
+SIGNER_CROP = False  # Crop frames to the signer's pose bounding box before inference
+SIGNER_CROP_INTERVAL = 30  # Inferred frames between crop box refreshes
+SIGNER_CROP_MARGIN = 0.25  # Padding around the pose bounding box, as a fraction of its longer side
+MOTION_GATE_THRESHOLD = None  # Reuse the previous landmarks when a frame differs by less than this mean grey level (e.g. 2.0); None disables
+MOTION_GATE_MAX_REUSE = 5  # Maximum consecutive frames whose landmarks are reused
+MOTION_GATE_SIZE = 64  # Width in pixels of the thumbnail compared by the motion gate
+EXTRACT_FPS = None  # Step 3 samples at this rate directly (e.g. TARGET_FPS) so Step 4 is not needed; None keeps every FRAME_SKIP-th frame
+
+# Task grouping
+GROUP_BY_VIDEO = True  # Decode each video once for all of its segments instead of once per segment
+MERGE_SEGMENT_INTERVALS = True  # Overlapping/back-to-back segments share one sampling grid so shared frames are inferred once
+PLAN_CHUNK_ROWS = 500_000  # s3 reads the timestamp CSV in chunks of this many rows while planning
 
 # Threading
-MAX_WORKERS = 4
+MAX_WORKERS = 4  # Concurrent s3 tasks at start-up; s3 adapts it at runtime
+ADAPTIVE_MAX_WORKERS = 8  # Upper bound for s3's adaptive concurrency (capped at CPU count - 1)
+MEMORY_RESERVE_MB = 2048  # s3 stops adding concurrent tasks when less memory than this is available
+PROGRESS_INTERVAL = 50  # Log s3 progress every N completed videos
+DECODE_QUEUE_SIZE = 32  # Decoded frames buffered ahead of inference in each worker
+WRITE_QUEUE_SIZE = 16  # Finished segments buffered ahead of the background writer
+FSYNC_OUTPUT = True  # fsync each saved landmark array (runs on the writer thread)
+S4_PENDING_TASKS = 32  # Video tasks Step 4 keeps submitted to its worker pool at once
+TRANSCRIPT_WORKERS = 4  # Processes parsing and normalizing transcripts in Step 2
+TRANSCRIPT_CHUNKSIZE = 16  # Transcripts handed to a Step 2 worker at a time
+TRANSCRIPT_FETCH_WORKERS = 4  # Threads fetching transcripts in Step 1; they share one rate limiter
+TRANSCRIPT_RATE = 1.0  # Initial transcript requests per second of Step 1 across all threads
+TRANSCRIPT_MIN_RATE = 0.2  # Lower bound of the adaptive transcript request rate
+TRANSCRIPT_MAX_RATE = 5.0  # Upper bound of the adaptive transcript request rate
+TRANSCRIPT_RATE_INCREASE = 0.02  # Requests/s added to the rate after each successful fetch
+TRANSCRIPT_RATE_DECREASE = 0.5  # Factor applied to the rate when YouTube blocks a request
+TRANSCRIPT_THROTTLE_RETRIES = 2  # Times a blocked transcript is retried at the reduced rate within a run
+VIDEO_DOWNLOAD_WORKERS = 4  # Videos Step 1 downloads at once, each thread reusing one YoutubeDL (YT_CONFIG's limit_rate applies per download)
+VIDEO_DOWNLOAD_PAUSE = 0.2  # Seconds each Step 1 download thread waits before starting its next video
+VIDEO_REPORT_INTERVAL = 30  # Seconds between Step 1 logs of aggregate download bandwidth and queue depth
+
+# Multi-host sharding (overridden by --shard-index/--num-shards)
+NUM_SHARDS = 1  # Hosts splitting the video list by a stable hash of the video ID
+SHARD_INDEX = 0  # Shard processed by this host, 0 <= SHARD_INDEX < NUM_SHARDS
+
+# Landmark output
+LANDMARK_DTYPE = "float32"  # dtype of saved landmark arrays ("float64" reproduces the original output)
+OUTPUT_FORMAT = "npy"  # "npy" writes one file per sentence; "shard" appends to indexed shard files
+SHARD_MAX_BYTES = 1 << 30  # Start a new shard file once the current one reaches this size
 
 # FPS reduction
 TARGET_FPS = 8.0  # Target FPS for reduced landmark data
+EXTRA_TARGET_FPS = []  # Further rates Step 4 writes from the same read of each array (e.g. [12, 25]), each to its own npy_fps{N}/
+RESAMPLE_METHOD = "skip"  # "skip" keeps every int(fps / target)-th frame; "nearest"/"linear" resample at the exact rate by timestamp
 
 # Supported languages
 LANGUAGE = [
@@ -46,6 +97,11 @@ LANGUAGE = [
     "en-JM",
 ]
 
+# Logging and metrics
+LOG_LEVEL = "INFO"  # DEBUG logs per-video memory usage, which is costly in the hot path
+METRICS_FORMAT = "prometheus"  # "prometheus" textfile or "json"
+METRICS_INTERVAL = 30  # Seconds between metrics snapshots
+
 # =============================================================================
 # YOUTUBE DOWNLOADER CONFIGURATION
 # =============================================================================
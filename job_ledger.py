@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""SQLite ledger of per-item job state shared by every pipeline stage.
+
+Each row is keyed by (stage, key), where key is a video ID for the download
+and segmentation stages and a SENTENCE_NAME for the landmark stages. Rows
+record status, attempt count, last error, output path, duration and an
+optional input fingerprint, so a restarted run can decide what is left to do
+from one indexed query instead of re-globbing output directories.
+
+The first time a stage is consulted with an empty ledger it is seeded from a
+caller-supplied directory scan, after which the ledger alone is used.
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import conf as c
+from sharding import shard_local_path
+
+logger = logging.getLogger(__name__)
+
+# Stage names used by the pipeline scripts
+STAGE_TRANSCRIPT = "transcript"
+STAGE_VIDEO = "video"
+STAGE_SEGMENTS = "segments"
+STAGE_LANDMARKS = "landmarks"
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_EMPTY = "empty"  # Processed successfully but produced no output (e.g. no landmarks)
+STATUS_FAILED = "failed"
+DONE_STATUSES = (STATUS_DONE, STATUS_EMPTY)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    stage TEXT NOT NULL,
+    key TEXT NOT NULL,
+    video_id TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    output_path TEXT,
+    duration REAL,
+    updated_at REAL NOT NULL,
+    fingerprint TEXT,
+    PRIMARY KEY (stage, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS jobs_stage_status ON jobs (stage, status);
+CREATE INDEX IF NOT EXISTS jobs_video ON jobs (video_id);
+"""
+
+
+def fps_stage(target_fps):
+    """Stage name for FPS reduction to a given target rate."""
+    return f"fps{target_fps:g}"
+
+
+def is_segment_stage(stage):
+    """Whether a stage's jobs are per caption segment, keyed by SENTENCE_NAME."""
+    return stage == STAGE_LANDMARKS or stage.startswith("fps")
+
+
+@contextmanager
+def transaction(conn):
+    """
+    Run a block of writes as one transaction on an autocommit connection,
+    where `with conn:` does not open one and every statement (each row of an
+    executemany) would otherwise commit separately. Callers hold the lock
+    that serialises writes on the connection.
+    """
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+class JobLedger:
+    """Per-process handle on the ledger database."""
+
+    def __init__(self, path=None):
+        self.path = path or shard_local_path(c.LEDGER_PATH)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Shared by a worker's pipeline threads; writes are serialised by _lock
+        self._conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        if "fingerprint" not in self._columns("main"):
+            # Ledgers created before input fingerprints were recorded
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN fingerprint TEXT")
+
+    def _columns(self, schema):
+        return {row[1] for row in self._conn.execute(f"PRAGMA {schema}.table_info(jobs)")}
+
+    def close(self):
+        self._conn.close()
+
+    def count(self, stage):
+        return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE stage = ?", (stage,)).fetchone()[0]
+
+    def keys(self, stage, statuses=DONE_STATUSES):
+        """Return the set of keys in a stage with one of the given statuses."""
+        placeholders = ",".join("?" * len(statuses))
+        rows = self._conn.execute(
+            f"SELECT key FROM jobs WHERE stage = ? AND status IN ({placeholders})",
+            (stage, *statuses),
+        )
+        return {key for key, in rows}
+
+    def done_keys(self, stage, bootstrap=None):
+        """
+        Return the keys already completed for a stage. If the stage has no rows
+        yet and `bootstrap` is given, it is called once to list keys that are
+        already done on disk and the ledger is seeded with them.
+        """
+        if bootstrap is not None and self.count(stage) == 0:
+            seeded = set(bootstrap())
+            self.seed(stage, seeded)
+            logger.info("Seeded ledger stage '%s' with %d existing items", stage, len(seeded))
+            return seeded
+        return self.keys(stage)
+
+    def seed(self, stage, keys, video_id=None):
+        """Mark keys as done without touching their attempt counters."""
+        now = time.time()
+        with self._lock, transaction(self._conn):
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (stage, key, video_id, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                ((stage, key, video_id(key) if video_id else None, STATUS_DONE, now) for key in keys),
+            )
+
+    def get(self, stage, key):
+        row = self._conn.execute(
+            "SELECT status, attempts, error, output_path, duration FROM jobs WHERE stage = ? AND key = ?",
+            (stage, key),
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("status", "attempts", "error", "output_path", "duration"), row))
+
+    def is_done(self, stage, key):
+        entry = self.get(stage, key)
+        return entry is not None and entry["status"] in DONE_STATUSES
+
+    def _record(self, stage, key, status, video_id=None, error=None, output_path=None,
+                duration=None, attempt=True, fingerprint=None):
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (
+                    stage, key, video_id, status, attempts, error, output_path, duration, updated_at, fingerprint
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (stage, key) DO UPDATE SET
+                    video_id = COALESCE(excluded.video_id, video_id),
+                    status = excluded.status,
+                    attempts = attempts + excluded.attempts,
+                    error = excluded.error,
+                    output_path = COALESCE(excluded.output_path, output_path),
+                    duration = COALESCE(excluded.duration, duration),
+                    updated_at = excluded.updated_at,
+                    fingerprint = excluded.fingerprint
+                """,
+                (stage, key, video_id, status, int(attempt), error, output_path, duration, time.time(), fingerprint),
+            )
+
+    def start(self, stage, key, video_id=None):
+        """Mark a job as running and count the attempt."""
+        self._record(stage, key, STATUS_RUNNING, video_id=video_id)
+
+    def finish(self, stage, key, video_id=None, output_path=None, duration=None, status=STATUS_DONE,
+               fingerprint=None):
+        self._record(stage, key, status, video_id=video_id, output_path=output_path,
+                     duration=duration, attempt=False, fingerprint=fingerprint)
+
+    def fail(self, stage, key, error, video_id=None, duration=None):
+        self._record(stage, key, STATUS_FAILED, video_id=video_id, error=str(error),
+                     duration=duration, attempt=False)
+
+    def reset(self, stage, statuses=None):
+        """Forget a stage's jobs (optionally only those with given statuses)."""
+        with self._lock, transaction(self._conn):
+            if statuses:
+                placeholders = ",".join("?" * len(statuses))
+                cursor = self._conn.execute(
+                    f"DELETE FROM jobs WHERE stage = ? AND status IN ({placeholders})",
+                    (stage, *statuses),
+                )
+            else:
+                cursor = self._conn.execute("DELETE FROM jobs WHERE stage = ?", (stage,))
+        return cursor.rowcount
+
+    def invalidate(self, stages, keys, error):
+        """
+        Mark existing jobs as failed so the next run redoes them, e.g. because
+        their input changed. Unlike reset, the stage keeps its rows, so it is
+        not seeded again from outputs on disk. Returns the number of jobs marked.
+        """
+        now = time.time()
+        with self._lock, transaction(self._conn):
+            cursor = self._conn.executemany(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE stage = ? AND key = ?",
+                ((STATUS_FAILED, error, now, stage, key) for stage in stages for key in keys),
+            )
+        return cursor.rowcount
+
+    def summary(self):
+        """Return {stage: {status: count}} for every stage in the ledger."""
+        result = {}
+        rows = self._conn.execute("SELECT stage, status, COUNT(*) FROM jobs GROUP BY stage, status")
+        for stage, status, count in rows:
+            result.setdefault(stage, {})[status] = count
+        return result
+
+    def statuses(self, stage):
+        """Return {key: status} for every job of a stage."""
+        rows = self._conn.execute("SELECT key, status FROM jobs WHERE stage = ?", (stage,))
+        return dict(rows.fetchall())
+
+    def updated_at(self, stage, statuses=DONE_STATUSES):
+        """Return {key: updated_at} for a stage's jobs with one of the given statuses."""
+        placeholders = ",".join("?" * len(statuses))
+        rows = self._conn.execute(
+            f"SELECT key, updated_at FROM jobs WHERE stage = ? AND status IN ({placeholders})",
+            (stage, *statuses),
+        )
+        return dict(rows.fetchall())
+
+    def fingerprints(self, stage, statuses=DONE_STATUSES):
+        """Return {key: fingerprint} for a stage's jobs with one of the given statuses."""
+        placeholders = ",".join("?" * len(statuses))
+        rows = self._conn.execute(
+            f"SELECT key, fingerprint FROM jobs WHERE stage = ? AND status IN ({placeholders})",
+            (stage, *statuses),
+        )
+        return dict(rows.fetchall())
+
+    def video_ids(self, stage):
+        """Return {key: video_id} for a stage's jobs that recorded their video."""
+        rows = self._conn.execute(
+            "SELECT key, video_id FROM jobs WHERE stage = ? AND video_id IS NOT NULL", (stage,)
+        )
+        return dict(rows.fetchall())
+
+    def merge_from(self, path):
+        """
+        Copy every job from another ledger file, keeping whichever copy of a
+        job was updated last. Returns the number of rows inserted or updated.
+        """
+        with self._lock:
+            self._conn.execute("ATTACH DATABASE ? AS other", (path,))
+            try:
+                fingerprint = "fingerprint" if "fingerprint" in self._columns("other") else "NULL"
+                with transaction(self._conn):
+                    cursor = self._conn.execute(
+                        f"""
+                        INSERT INTO jobs (
+                            stage, key, video_id, status, attempts, error, output_path, duration, updated_at, fingerprint
+                        )
+                        SELECT stage, key, video_id, status, attempts, error, output_path, duration, updated_at,
+                            {fingerprint}
+                        FROM other.jobs WHERE true
+                        ON CONFLICT (stage, key) DO UPDATE SET
+                            video_id = COALESCE(excluded.video_id, video_id),
+                            status = excluded.status,
+                            attempts = excluded.attempts,
+                            error = excluded.error,
+                            output_path = COALESCE(excluded.output_path, output_path),
+                            duration = COALESCE(excluded.duration, duration),
+                            updated_at = excluded.updated_at,
+                            fingerprint = excluded.fingerprint
+                        WHERE excluded.updated_at > jobs.updated_at
+                        """
+                    )
+                    return cursor.rowcount
+            finally:
+                self._conn.execute("DETACH DATABASE other")
+
+
+_LEDGERS = {}
+
+
+def get_ledger(path=None):
+    """
+    Return this process's ledger handle. SQLite connections must not be shared
+    across fork(), so handles are cached per process ID. Sharded runs use a
+    per-shard ledger file (see sharding.shard_local_path).
+    """
+    key = (os.getpid(), path or shard_local_path(c.LEDGER_PATH))
+    if key not in _LEDGERS:
+        _LEDGERS[key] = JobLedger(path)
+    return _LEDGERS[key]
+
+
+def close_ledgers():
+    """Close and forget every ledger handle cached by this process."""
+    for ledger in _LEDGERS.values():
+        ledger.close()
+    _LEDGERS.clear()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or reset the pipeline job ledger")
+    parser.add_argument("--ledger", default=c.LEDGER_PATH, help="Path to the ledger database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("summary", help="Print job counts per stage and status")
+    reset = subparsers.add_parser("reset", help="Forget jobs of a stage so they are rerun")
+    reset.add_argument("stage")
+    reset.add_argument("--status", action="append", help="Only reset jobs with this status")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    ledger = JobLedger(args.ledger)
+    if args.command == "summary":
+        for stage, counts in sorted(ledger.summary().items()):
+            details = ", ".join(f"{status}={count}" for status, count in sorted(counts.items()))
+            print(f"{stage}: {details}")
+    elif args.command == "reset":
+        removed = ledger.reset(args.stage, args.status)
+        print(f"Removed {removed} jobs from stage '{args.stage}'")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    main()
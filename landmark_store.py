@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""Storage backends for per-sentence landmark arrays.
+
+Two layouts are supported and selected with ``conf.OUTPUT_FORMAT``:
+
+- ``"npy"``: one ``<SENTENCE_NAME>.npy`` file per segment (the original layout),
+  with its metadata in a ``<SENTENCE_NAME>.json`` sidecar.
+- ``"shard"``: large append-only ``*.bin`` shard files holding many segments,
+  each with a ``*.idx`` JSON-lines index mapping sentence name to
+  (shard, offset, shape, dtype) and a ``*.meta`` JSON-lines file holding the
+  metadata, which the index points into by byte range. Reads are zero-copy
+  ``np.memmap`` views.
+
+Metadata is a small JSON object describing how a sequence was sampled (source
+fps, sampling step, frame timestamps, landmark layout; see
+``s3_mediapipe_labelling.segment_metadata``). It can be read without touching
+the array or the source video. Shard metadata is only read when asked for,
+so listing names or loading arrays never parses the per-frame timestamp lists.
+
+Every writing process appends to its own shard files, so several workers (or
+hosts sharing a dataset directory) never write to the same file. Each index
+entry records when it was written, and when a name appears in more than one
+entry the most recently written one wins, whichever file it is in. Entries
+from indexes written before that was recorded date from their index file's
+modification time.
+
+Callers address arrays by the same ``<directory>/<SENTENCE_NAME>.npy`` path in
+both layouts; ``save_landmarks``/``load_landmarks`` resolve it to the
+configured store.
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import time
+from glob import glob
+
+import numpy as np
+
+import conf as c
+from sharding import temporary_path
+
+logger = logging.getLogger(__name__)
+
+SHARD_ALIGNMENT = 64  # Byte alignment of each array inside a shard
+
+
+class NpyDirStore:
+    """One .npy file per sentence name."""
+
+    format = "npy"
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{name}.npy")
+
+    def metadata_path(self, name):
+        return os.path.join(self.directory, f"{name}.json")
+
+    def names(self):
+        return {
+            os.path.splitext(os.path.basename(f))[0]
+            for f in glob(os.path.join(self.directory, "*.npy"))
+        }
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def save(self, name, array, fsync=False, metadata=None):
+        # Written under a temporary name and renamed, so readers on other
+        # hosts never see a partial file. The sidecar goes first so an array
+        # is never visible without its metadata.
+        os.makedirs(self.directory, exist_ok=True)
+        if metadata is not None:
+            self._replace(self.metadata_path(name), json.dumps(metadata).encode("utf-8"), fsync)
+        path = self.path(name)
+        tmp_path = temporary_path(path)
+        with open(tmp_path, "wb") as out_file:
+            np.save(out_file, array)
+            if fsync:
+                out_file.flush()
+                os.fsync(out_file.fileno())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _replace(path, data, fsync):
+        tmp_path = temporary_path(path)
+        with open(tmp_path, "wb") as out_file:
+            out_file.write(data)
+            if fsync:
+                out_file.flush()
+                os.fsync(out_file.fileno())
+        os.replace(tmp_path, path)
+
+    def load(self, name, mmap=True):
+        return np.load(self.path(name), mmap_mode="r" if mmap else None)
+
+    def load_metadata(self, name):
+        try:
+            with open(self.metadata_path(name), "rb") as meta_file:
+                return json.load(meta_file)
+        except FileNotFoundError:
+            return None
+
+    def close(self):
+        pass
+
+
+class ShardStore:
+    """Append-only shard files with per-shard JSON-lines index and metadata files."""
+
+    format = "shard"
+
+    def __init__(self, directory, shard_max_bytes=None):
+        self.directory = directory
+        self.shard_max_bytes = shard_max_bytes or c.SHARD_MAX_BYTES
+        self._index = None
+        self._index_files = {}
+        self._writer = None
+        self._index_writer = None
+        self._meta_writer = None
+        self._shard_path = None
+        self._shard_seq = 0
+
+    # ------------------------------------------------------------------ read
+
+    def _read_index_file(self, index_path, start=0):
+        shard = os.path.splitext(os.path.basename(index_path))[0] + ".bin"
+        file_written = os.path.getmtime(index_path)
+        with open(index_path, "rb") as index_file:
+            index_file.seek(start)
+            for line in index_file:
+                if not line.endswith(b"\n"):
+                    # Partially written trailing entry from a live writer
+                    break
+                entry = json.loads(line)
+                start += len(line)
+                written = entry.get("written", file_written)
+                current = self._index.get(entry["name"])
+                if current is not None and current[5] > written:
+                    continue
+                self._index[entry["name"]] = (
+                    shard,
+                    entry["offset"],
+                    tuple(entry["shape"]),
+                    entry["dtype"],
+                    # Byte range in the shard's .meta file; older indexes stored the metadata inline
+                    entry.get("meta_range", entry.get("meta")),
+                    written,
+                )
+        return start
+
+    def refresh(self):
+        """Load index entries written since the last refresh."""
+        if self._index is None:
+            self._index = {}
+        for index_path in sorted(glob(os.path.join(self.directory, "*.idx"))):
+            start = self._index_files.get(index_path, 0)
+            self._index_files[index_path] = self._read_index_file(index_path, start)
+        return self._index
+
+    @property
+    def index(self):
+        if self._index is None:
+            self.refresh()
+        return self._index
+
+    def names(self):
+        return set(self.index)
+
+    def exists(self, name):
+        return name in self.index
+
+    def load(self, name, mmap=True):
+        shard, offset, shape, dtype, _, _ = self.index[name]
+        array = np.memmap(
+            os.path.join(self.directory, shard),
+            dtype=np.dtype(dtype),
+            mode="r",
+            offset=offset,
+            shape=shape,
+        )
+        return array if mmap else np.array(array)
+
+    def load_metadata(self, name):
+        shard, _, _, _, meta, _ = self.index[name]
+        if meta is None or isinstance(meta, dict):
+            return meta
+        start, length = meta
+        meta_path = os.path.join(self.directory, os.path.splitext(shard)[0] + ".meta")
+        with open(meta_path, "rb") as meta_file:
+            meta_file.seek(start)
+            return json.loads(meta_file.read(length))
+
+    # ----------------------------------------------------------------- write
+
+    def _open_shard(self):
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        stem = f"shard-{socket.gethostname()}-{os.getpid()}-{int(time.time())}-{self._shard_seq:04d}"
+        self._shard_seq += 1
+        self._shard_path = os.path.join(self.directory, f"{stem}.bin")
+        self._writer = open(self._shard_path, "ab")
+        self._index_writer = open(os.path.join(self.directory, f"{stem}.idx"), "a", encoding="utf-8")
+        self._meta_writer = open(os.path.join(self.directory, f"{stem}.meta"), "ab")
+
+    def save(self, name, array, fsync=False, metadata=None):
+        array = np.ascontiguousarray(array)
+        if self._writer is None or self._writer.tell() >= self.shard_max_bytes:
+            self._open_shard()
+
+        offset = self._writer.tell()
+        padding = -offset % SHARD_ALIGNMENT
+        if padding:
+            self._writer.write(b"\0" * padding)
+            offset += padding
+        self._writer.write(array.tobytes())
+        self._writer.flush()
+        if fsync:
+            os.fsync(self._writer.fileno())
+
+        meta_range = None
+        if metadata is not None:
+            meta_bytes = json.dumps(metadata).encode("utf-8") + b"\n"
+            meta_range = [self._meta_writer.tell(), len(meta_bytes)]
+            self._meta_writer.write(meta_bytes)
+            self._meta_writer.flush()
+            if fsync:
+                os.fsync(self._meta_writer.fileno())
+
+        # The index entry is written only after its data and metadata are on disk
+        entry = {
+            "name": name,
+            "offset": offset,
+            "shape": list(array.shape),
+            "dtype": array.dtype.str,
+            "written": time.time(),
+        }
+        if meta_range is not None:
+            entry["meta_range"] = meta_range
+        self._index_writer.write(json.dumps(entry) + "\n")
+        self._index_writer.flush()
+        if fsync:
+            os.fsync(self._index_writer.fileno())
+
+        if self._index is not None:
+            self._index[name] = (
+                os.path.basename(self._shard_path), offset, array.shape, array.dtype.str, meta_range,
+                entry["written"],
+            )
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._index_writer.close()
+            self._meta_writer.close()
+            self._writer = None
+            self._index_writer = None
+            self._meta_writer = None
+
+
+STORE_TYPES = {
+    NpyDirStore.format: NpyDirStore,
+    ShardStore.format: ShardStore,
+}
+
+_STORES = {}
+
+
+def open_store(directory, fmt=None):
+    """Return the per-process store for a directory, creating it on first use."""
+    fmt = fmt or c.OUTPUT_FORMAT
+    if fmt not in STORE_TYPES:
+        raise ValueError(f"Unknown landmark output format: {fmt}")
+    key = (os.path.abspath(directory), fmt)
+    if key not in _STORES:
+        _STORES[key] = STORE_TYPES[fmt](directory)
+    return _STORES[key]
+
+
+def close_stores():
+    """Close and forget every store opened by this process."""
+    for store in _STORES.values():
+        store.close()
+    _STORES.clear()
+
+
+def _split_path(path):
+    directory, filename = os.path.split(path)
+    return directory, os.path.splitext(filename)[0]
+
+
+def save_landmarks(path, array, fmt=None, fsync=False, metadata=None):
+    """Save an array addressed as <directory>/<SENTENCE_NAME>.npy, with optional metadata."""
+    directory, name = _split_path(path)
+    open_store(directory, fmt).save(name, array, fsync=fsync, metadata=metadata)
+
+
+def load_landmarks(path, mmap=True, fmt=None):
+    """Load an array addressed as <directory>/<SENTENCE_NAME>.npy."""
+    directory, name = _split_path(path)
+    return open_store(directory, fmt).load(name, mmap=mmap)
+
+
+def load_landmark_metadata(path, fmt=None):
+    """Load the metadata of an array addressed as <directory>/<SENTENCE_NAME>.npy (None if absent)."""
+    directory, name = _split_path(path)
+    return open_store(directory, fmt).load_metadata(name)
+
+
+def list_landmarks(directory, fmt=None):
+    """Return the set of sentence names stored in a directory."""
+    return open_store(directory, fmt).names()
+
+
+def convert(source_dir, target_dir, source_fmt="npy", target_fmt="shard"):
+    """Copy every array from one store layout to another and return the count."""
+    source = STORE_TYPES[source_fmt](source_dir)
+    target = STORE_TYPES[target_fmt](target_dir)
+    existing = target.names()
+    converted = 0
+    for name in sorted(source.names() - existing):
+        target.save(name, source.load(name), metadata=source.load_metadata(name))
+        converted += 1
+    target.close()
+    logger.info(
+        "Converted %d arrays from %s (%s) to %s (%s), %d already present",
+        converted, source_dir, source_fmt, target_dir, target_fmt, len(existing),
+    )
+    return converted
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert landmark arrays between storage layouts")
+    parser.add_argument("source_dir", help="Directory to read landmark arrays from")
+    parser.add_argument("target_dir", help="Directory to write landmark arrays to")
+    parser.add_argument("--from", dest="source_fmt", choices=sorted(STORE_TYPES), default="npy")
+    parser.add_argument("--to", dest="target_fmt", choices=sorted(STORE_TYPES), default="shard")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    convert(args.source_dir, args.target_dir, args.source_fmt, args.target_fmt)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Lightweight counters, gauges and timing histograms for long pipeline runs.
+
+Each process records into the module-level ``METRICS`` registry. Worker
+processes hand their measurements to the parent with ``METRICS.drain()``
+(returned alongside task results) and the parent folds them in with
+``METRICS.merge()``. ``MetricsExporter`` periodically writes the aggregated
+registry to ``<conf.METRICS_DIR>/<stage>.json`` or, as a Prometheus textfile,
+``<stage>.prom``, so a multi-day run can be watched with ``cat`` or
+node_exporter's textfile collector.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import conf as c
+from sharding import shard_suffix, temporary_path
+
+# Upper bounds (seconds) of the timing histogram buckets; +Inf is implicit
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROMETHEUS_PREFIX = "asl_"
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name, value):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = {"buckets": [0] * (len(BUCKETS) + 1), "sum": 0.0, "count": 0}
+            index = 0
+            while index < len(BUCKETS) and value > BUCKETS[index]:
+                index += 1
+            histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    @contextmanager
+    def timer(self, name):
+        """Observe the wall time of the block into the `<name>_seconds` histogram."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - started)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {
+                    name: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                    for name, h in self.histograms.items()
+                },
+            }
+
+    def drain(self):
+        """Return a snapshot and reset counters and histograms (gauges are kept)."""
+        with self._lock:
+            snapshot = {
+                "counters": self.counters,
+                "gauges": dict(self.gauges),
+                "histograms": self.histograms,
+            }
+            self.counters = {}
+            self.histograms = {}
+        return snapshot
+
+    def merge(self, snapshot):
+        """Add a snapshot drained from another process into this registry."""
+        if not snapshot:
+            return
+        with self._lock:
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, histogram in snapshot["histograms"].items():
+                target = self.histograms.get(name)
+                if target is None:
+                    self.histograms[name] = {
+                        "buckets": list(histogram["buckets"]),
+                        "sum": histogram["sum"],
+                        "count": histogram["count"],
+                    }
+                    continue
+                target["buckets"] = [a + b for a, b in zip(target["buckets"], histogram["buckets"])]
+                target["sum"] += histogram["sum"]
+                target["count"] += histogram["count"]
+
+
+METRICS = Metrics()
+
+
+def to_prometheus(snapshot):
+    """Render a snapshot in the Prometheus text exposition format."""
+    lines = []
+    for name, value in sorted(snapshot["counters"].items()):
+        metric = f"{PROMETHEUS_PREFIX}{name}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, value in sorted(snapshot["gauges"].items()):
+        metric = f"{PROMETHEUS_PREFIX}{name}"
+        lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+    for name, histogram in sorted(snapshot["histograms"].items()):
+        metric = f"{PROMETHEUS_PREFIX}{name}"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), histogram["buckets"]):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines += [f"{metric}_sum {histogram['sum']}", f"{metric}_count {histogram['count']}"]
+    return "\n".join(lines) + "\n"
+
+
+def write_snapshot(snapshot, path, fmt):
+    """Atomically replace `path` with the snapshot rendered as JSON or Prometheus text."""
+    if fmt == "prometheus":
+        content = to_prometheus(snapshot)
+    else:
+        content = json.dumps(dict(snapshot, written_at=time.time()), indent=2)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = temporary_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as out_file:
+        out_file.write(content)
+    os.replace(tmp_path, path)
+
+
+class MetricsExporter:
+    """Writes the process's METRICS registry at most every `interval` seconds."""
+
+    def __init__(self, stage, fmt=None, interval=None, registry=METRICS):
+        self.fmt = fmt or c.METRICS_FORMAT
+        extension = "prom" if self.fmt == "prometheus" else "json"
+        filename = f"{stage}{shard_suffix()}.{extension}"
+        self.path = os.path.join(c.METRICS_DIR, filename) if c.METRICS_DIR else None
+        self.interval = c.METRICS_INTERVAL if interval is None else interval
+        self.registry = registry
+        self._last_export = 0.0
+
+    def maybe_export(self):
+        if not self.path or time.monotonic() - self._last_export < self.interval:
+            return False
+        self.export()
+        return True
+
+    def export(self):
+        if not self.path:
+            return
+        write_snapshot(self.registry.snapshot(), self.path, self.fmt)
+        self._last_export = time.monotonic()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Token-bucket rate limiter with additive-increase/multiplicative-decrease.
+
+Step 1 fetches transcripts from several threads that share one limiter, so
+the request rate to YouTube is bounded as a whole rather than per worker.
+Every request takes a token; tokens refill at ``rate`` per second up to
+``burst``. Each success raises the rate by ``increase`` (up to
+``max_rate``) and a throttled request multiplies it by ``decrease`` (down to
+``min_rate``) and drops any saved-up burst, so the fetcher settles just below
+the rate at which requests start getting blocked.
+"""
+import threading
+import time
+
+
+class AdaptiveRateLimiter:
+    """Thread-safe token bucket whose rate adapts with AIMD."""
+
+    def __init__(self, rate, min_rate, max_rate, increase, decrease, burst=1.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._updated = clock()
+        self._last_decrease = None
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """
+        Take a token, sleeping until it is available. Tokens are reserved
+        under the lock and waited for outside it, so waiting threads are
+        served in arrival order. Returns the seconds slept.
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            self._sleep(wait)
+        return wait
+
+    def on_success(self):
+        """Additive increase after a request went through."""
+        with self._lock:
+            self._refill(self._clock())
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        """
+        Multiplicative decrease after a request was blocked. Requests already
+        in flight when the rate was cut report their blocks too, so further
+        blocks within one interval of the new rate count as the same event.
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if self._last_decrease is not None and now - self._last_decrease < 1 / self.rate:
+                return
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = min(self._tokens, 0.0)
+            self._last_decrease = now
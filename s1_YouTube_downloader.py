@@ -9,8 +9,11 @@ Transcripts are downloaded first (if not already saved) and then videos are down
 import argparse
 import pdb
 import os
+import threading
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
 from glob import glob
 from yt_dlp import YoutubeDL
 from yt_dlp.utils import (
@@ -26,10 +29,11 @@ from youtube_transcript_api.formatters import JSONFormatter
 from tqdm import tqdm
 
 import conf as c  # Using 'c' for configuration
-from existing_video_ids import (
-    load_existing_video_id_list,
-    write_existing_video_ids,
-)
+from existing_video_ids import load_existing_video_id_list
+from job_ledger import STAGE_TRANSCRIPT, STAGE_VIDEO, get_ledger
+from metrics import METRICS, MetricsExporter
+from rate_limiter import AdaptiveRateLimiter
+from sharding import add_shard_arguments, configure_shard, in_shard, temporary_path
 
 
 
@@ -39,7 +43,7 @@ from existing_video_ids import (
 
 # Configure logging for debugging
 logging.basicConfig(
-    level=logging.INFO,
+    level=c.LOG_LEVEL,
     format="%(asctime)s - %(levelname)s - %(message)s",
 )
 logger = logging.getLogger(__name__)
@@ -53,7 +57,8 @@ RATE_LIMIT_ERRORS = tuple(
     if err is not None
 )
 
-_TRANSCRIPT_CLIENT = None
+# One transcript client (and with it one HTTP session) per fetching thread
+_TRANSCRIPT_CLIENTS = threading.local()
 
 
 def get_existing_ids(directory, ext):
@@ -63,8 +68,9 @@ def get_existing_ids(directory, ext):
 
 
 def load_video_ids(file_path):
+    """Return the video IDs listed in a file that belong to this host's shard."""
     with open(file_path, "r", encoding="utf-8") as f:
-        return {line.strip() for line in f if line.strip()}
+        return {line.strip() for line in f if line.strip() and in_shard(line.strip())}
 
 
 def _normalise_languages(raw_languages):
@@ -78,8 +84,8 @@ def _normalise_languages(raw_languages):
 
 
 def _get_transcript_client():
-    global _TRANSCRIPT_CLIENT
-    if _TRANSCRIPT_CLIENT is None:
+    client = getattr(_TRANSCRIPT_CLIENTS, "client", None)
+    if client is None:
         try:
 
         #    ytt_api =  YouTubeTranscriptApi(
@@ -91,12 +97,13 @@ def _get_transcript_client():
         #    print('Proxy Used')
 
            
-           _TRANSCRIPT_CLIENT = YouTubeTranscriptApi()
+           client = YouTubeTranscriptApi()
 
 
         except TypeError:
-            _TRANSCRIPT_CLIENT = YouTubeTranscriptApi
-    return _TRANSCRIPT_CLIENT
+            client = YouTubeTranscriptApi
+        _TRANSCRIPT_CLIENTS.client = client
+    return client
 
 
 def _fetched_to_dicts(fetched):
@@ -119,9 +126,14 @@ def _fetched_to_dicts(fetched):
         return fetched
 
 
-def fetch_transcript(video_id):
-    """Return transcript entries for a video using whichever API is available."""
+def fetch_transcript(video_id, client=None):
+    """
+    Return transcript entries for a video using whichever API is available, or
+    with `client` (any object with YouTubeTranscriptApi's fetch) if given.
+    """
     languages = _normalise_languages(c.LANGUAGE)
+    if client is not None:
+        return _fetched_to_dicts(client.fetch(video_id, languages=languages or ["en"]))
 
     get_transcript = getattr(YouTubeTranscriptApi, "get_transcript", None)
     if callable(get_transcript):
@@ -137,35 +149,76 @@ def fetch_transcript(video_id):
     return _fetched_to_dicts(fetched)
 
 
-def download_single_transcript(video_id, formatter, sleep_time):
-    """Download a single transcript for a video ID."""
-
-
+def transcript_rate_limiter():
+    """The adaptive rate limiter shared by the transcript fetching threads, configured from conf."""
+    return AdaptiveRateLimiter(
+        rate=c.TRANSCRIPT_RATE,
+        min_rate=c.TRANSCRIPT_MIN_RATE,
+        max_rate=c.TRANSCRIPT_MAX_RATE,
+        increase=c.TRANSCRIPT_RATE_INCREASE,
+        decrease=c.TRANSCRIPT_RATE_DECREASE,
+    )
 
 
-    try:
-        transcript = fetch_transcript(video_id)
-        json_transcript = formatter.format_transcript(transcript)
-        transcript_path = os.path.join(c.TRANSCRIPT_DIR, f"{video_id}.json")
-        with open(transcript_path, "w", encoding="utf-8") as out_file:
-            out_file.write(json_transcript)
-        logger.info("SUCCESS: Transcript for %s saved.", video_id)
-        return True, sleep_time
-    except Exception as e:
-        if RATE_LIMIT_ERRORS and isinstance(e, RATE_LIMIT_ERRORS):
-            sleep_time = min(sleep_time + 0.1, 5)
-            logger.error("Request throttled for %s. Error: %s", video_id, e)
-        elif isinstance(e, YouTubeTranscriptApiException):
-            logger.error("YouTube transcript API error for %s. Error: %s", video_id, e)
-        else:
-            logger.error("An unexpected error occurred for %s. Error: %s", video_id, e)
-        return False, sleep_time
-
-
-def download_transcripts(test_mode=False):
-    """Download transcripts for video IDs in conf.ID if not already saved."""
+def download_single_transcript(video_id, formatter, limiter, client=None):
+    """
+    Download a single transcript for a video ID, taking a token from `limiter`
+    before every request. A throttled request lowers the shared rate and is
+    retried up to conf.TRANSCRIPT_THROTTLE_RETRIES times.
+    """
+    ledger = get_ledger()
+    for attempt in range(c.TRANSCRIPT_THROTTLE_RETRIES + 1):
+        limiter.acquire()
+        ledger.start(STAGE_TRANSCRIPT, video_id, video_id=video_id)
+        started = time.perf_counter()
+        try:
+            with METRICS.timer("s1_transcript_fetch"):
+                transcript = fetch_transcript(video_id, client)
+            json_transcript = formatter.format_transcript(transcript)
+            transcript_path = os.path.join(c.TRANSCRIPT_DIR, f"{video_id}.json")
+            tmp_path = temporary_path(transcript_path)
+            with open(tmp_path, "w", encoding="utf-8") as out_file:
+                out_file.write(json_transcript)
+            os.replace(tmp_path, transcript_path)
+            ledger.finish(
+                STAGE_TRANSCRIPT, video_id, output_path=transcript_path,
+                duration=time.perf_counter() - started,
+            )
+            limiter.on_success()
+            METRICS.inc("s1_transcripts_downloaded")
+            logger.info("SUCCESS: Transcript for %s saved.", video_id)
+            return True
+        except Exception as e:
+            ledger.fail(STAGE_TRANSCRIPT, video_id, e, duration=time.perf_counter() - started)
+            if RATE_LIMIT_ERRORS and isinstance(e, RATE_LIMIT_ERRORS):
+                METRICS.inc("s1_transcripts_throttled")
+                limiter.on_throttle()
+                if attempt < c.TRANSCRIPT_THROTTLE_RETRIES:
+                    logger.warning(
+                        "Request throttled for %s; retrying at %.2f requests/s.", video_id, limiter.rate
+                    )
+                    continue
+                logger.error("Request throttled for %s. Error: %s", video_id, e)
+            elif isinstance(e, YouTubeTranscriptApiException):
+                logger.error("YouTube transcript API error for %s. Error: %s", video_id, e)
+            else:
+                logger.error("An unexpected error occurred for %s. Error: %s", video_id, e)
+            METRICS.inc("s1_transcripts_failed")
+            return False
+
+
+def download_transcripts(test_mode=False, client_factory=None, workers=None):
+    """
+    Download transcripts for video IDs in conf.ID if not already saved. Up to
+    `workers` (default conf.TRANSCRIPT_FETCH_WORKERS) threads fetch at once,
+    all paced by one adaptive rate limiter. `client_factory` returns the
+    client each thread fetches with (default: a YouTubeTranscriptApi with its
+    own HTTP session per thread), so a stub can stand in for YouTube.
+    """
     os.makedirs(c.TRANSCRIPT_DIR, exist_ok=True)
-    existing_ids = get_existing_ids(c.TRANSCRIPT_DIR, "json")
+    existing_ids = get_ledger().done_keys(
+        STAGE_TRANSCRIPT, bootstrap=lambda: get_existing_ids(c.TRANSCRIPT_DIR, "json")
+    )
 
     all_ids = load_video_ids(c.ID)
     ids = list(all_ids - existing_ids)
@@ -178,30 +231,106 @@ def download_transcripts(test_mode=False):
         return
 
     formatter = JSONFormatter()
-    sleep_time = 1
+    limiter = transcript_rate_limiter()
     error_count = 0
+    exporter = MetricsExporter("s1")
+    workers = workers or c.TRANSCRIPT_FETCH_WORKERS
+    clients = threading.local()
 
-    # Use a progress bar to show download progress
-    with tqdm(ids, desc="Downloading transcripts") as pbar:
-        for video_id in pbar:
-            sleep_time = min(sleep_time, 2)
-            time.sleep(sleep_time)  # Rate limiting pause
-            success, sleep_time = download_single_transcript(
-                video_id, formatter, sleep_time
-            )
+    def download(video_id):
+        if client_factory is not None and not hasattr(clients, "client"):
+            clients.client = client_factory()
+        return download_single_transcript(video_id, formatter, limiter, getattr(clients, "client", None))
 
+    # Use a progress bar to show download progress
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            tqdm(total=len(ids), desc="Downloading transcripts") as pbar:
+        for success in executor.map(download, ids):
             if not success:
                 error_count += 1
 
-            pbar.set_postfix(errors=error_count)
-
-
-def download_single_video(video_id, download_options):
-    """Download a YouTube video using specified options."""
+            pbar.update()
+            pbar.set_postfix(errors=error_count, rate=f"{limiter.rate:.2f}/s")
+            METRICS.set_gauge("s1_transcript_rate", limiter.rate)
+            exporter.maybe_export()
+
+    exporter.export()
+    logger.info("Transcript download completed: Total %d, Errors %d.", len(ids), error_count)
+
+
+class DownloadStats:
+    """
+    Thread-safe aggregate of the video downloads of a run: bytes received
+    (from yt-dlp progress hooks), downloads in flight and still queued.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.started = 0
+        self.completed = 0
+        self.bytes = 0
+        self._received = {}
+        self._lock = threading.Lock()
+        self._started_at = time.perf_counter()
+        self._last_report = (self._started_at, 0)
+
+    def hook(self, status):
+        """yt-dlp progress hook: adds the bytes received since the file's previous call."""
+        filename = status.get("filename")
+        downloaded = status.get("downloaded_bytes")
+        with self._lock:
+            previous = self._received.pop(filename, 0)
+            if downloaded is None:
+                return
+            received = max(downloaded - previous, 0)
+            self.bytes += received
+            if status.get("status") == "downloading":
+                self._received[filename] = downloaded
+        METRICS.inc("s1_video_bytes", received)
+
+    def start(self):
+        with self._lock:
+            self.started += 1
+
+    def finish(self):
+        with self._lock:
+            self.completed += 1
+
+    def report(self):
+        """
+        Return (in flight, queued, MB/s since the previous report, MB/s
+        overall) and update the metrics gauges.
+        """
+        now = time.perf_counter()
+        with self._lock:
+            in_flight = self.started - self.completed
+            queued = self.total - self.started
+            received = self.bytes
+            last_time, last_bytes = self._last_report
+            self._last_report = (now, received)
+        current = (received - last_bytes) / max(now - last_time, 1e-9) / 1e6
+        overall = received / max(now - self._started_at, 1e-9) / 1e6
+        METRICS.set_gauge("s1_video_in_flight", in_flight)
+        METRICS.set_gauge("s1_video_queue_depth", queued)
+        METRICS.set_gauge("s1_video_mb_per_second", current)
+        return in_flight, queued, current, overall
+
+
+def download_single_video(video_id, downloader):
+    """Download a YouTube video with a (reused) YoutubeDL instance."""
     video_url = f"https://www.youtube.com/watch?v={video_id}"
+    ledger = get_ledger()
+    ledger.start(STAGE_VIDEO, video_id, video_id=video_id)
+    started = time.perf_counter()
     try:
-        with YoutubeDL(download_options) as yt:
-            yt.extract_info(video_url)
+        with METRICS.timer("s1_video_download"):
+            downloader.extract_info(video_url)
+        ledger.finish(
+            STAGE_VIDEO, video_id,
+            output_path=os.path.join(c.VIDEO_DIR, f"{video_id}.mp4"),
+            duration=time.perf_counter() - started,
+        )
+        METRICS.inc("s1_videos_downloaded")
         logger.info("SUCCESS: Video %s downloaded.", video_id)
         return True
     except (
@@ -210,20 +339,33 @@ def download_single_video(video_id, download_options):
         PostProcessingError,
         UnavailableVideoError,
     ) as e:
+        ledger.fail(STAGE_VIDEO, video_id, e, duration=time.perf_counter() - started)
+        METRICS.inc("s1_videos_failed")
         logger.error("Error downloading video %s. Error: %s", video_id, e)
         return False
     except Exception as e:
+        ledger.fail(STAGE_VIDEO, video_id, e, duration=time.perf_counter() - started)
+        METRICS.inc("s1_videos_failed")
         logger.error("An unexpected error occurred for %s. Error: %s", video_id, e)
         return False
 
 
-def download_videos(test_mode=False):
-    """Download videos for video IDs specified in conf.ID if not already downloaded."""
+def download_videos(test_mode=False, downloader_factory=None, workers=None):
+    """
+    Download videos for video IDs specified in conf.ID if not already downloaded.
+    Up to `workers` (default conf.VIDEO_DOWNLOAD_WORKERS) threads download at
+    once, each with one YoutubeDL instance for all of its videos.
+    `downloader_factory(options)` creates those instances (default:
+    YoutubeDL), so a stub can stand in for yt-dlp. Aggregate bandwidth and
+    queue depth are logged every conf.VIDEO_REPORT_INTERVAL seconds. Returns
+    {"videos", "errors", "bytes"} of the run (None if there was nothing to do).
+    """
     os.makedirs(c.NPY_DIR, exist_ok=True)
     os.makedirs(c.VIDEO_DIR, exist_ok=True)
-    existing_ids = get_existing_ids(c.VIDEO_DIR, "mp4")
-    recorded_ids = write_existing_video_ids(existing_ids=existing_ids)
-    skip_ids = recorded_ids | load_existing_video_id_list()
+    existing_ids = get_ledger().done_keys(
+        STAGE_VIDEO, bootstrap=lambda: get_existing_ids(c.VIDEO_DIR, "mp4")
+    )
+    skip_ids = existing_ids | load_existing_video_id_list()
 
     all_ids = load_video_ids(c.ID)
     ids = list(all_ids - skip_ids)
@@ -235,20 +377,58 @@ def download_videos(test_mode=False):
         logger.info("All videos have already been downloaded.")
         return
 
+    stats = DownloadStats(len(ids))
+    download_options = dict(c.YT_CONFIG)
+    download_options["progress_hooks"] = [*download_options.get("progress_hooks", []), stats.hook]
+    downloader_factory = downloader_factory or YoutubeDL
+    workers = workers or c.VIDEO_DOWNLOAD_WORKERS
+    downloaders = threading.local()
     error_count = 0
-    # Use tqdm progress bar to show progress
-    with tqdm(ids, desc="Downloading videos", unit="video") as pbar:
-        for video_id in pbar:
-            time.sleep(0.2)  # Rate limiting pause
-            success = download_single_video(video_id, c.YT_CONFIG)
-            # break
-            if not success:
-                error_count += 1
-            pbar.set_postfix(errors=error_count)
-
-    write_existing_video_ids()
-
-    logger.info("Video download completed: Total %d, Errors %d.", error_count)
+    exporter = MetricsExporter("s1")
+
+    with ExitStack() as open_downloaders:
+        lock = threading.Lock()
+
+        def download(video_id):
+            downloader = getattr(downloaders, "downloader", None)
+            if downloader is None:
+                with lock:
+                    downloader = open_downloaders.enter_context(downloader_factory(download_options))
+                downloaders.downloader = downloader
+            time.sleep(c.VIDEO_DOWNLOAD_PAUSE)  # Rate limiting pause
+            stats.start()
+            try:
+                return download_single_video(video_id, downloader)
+            finally:
+                stats.finish()
+
+        # Use tqdm progress bar to show progress
+        with ThreadPoolExecutor(max_workers=workers) as executor, \
+                tqdm(total=len(ids), desc="Downloading videos", unit="video") as pbar:
+            futures = [executor.submit(download, video_id) for video_id in ids]
+            last_report = time.perf_counter()
+            for future in as_completed(futures):
+                if not future.result():
+                    error_count += 1
+                pbar.update()
+                pbar.set_postfix(errors=error_count)
+                if time.perf_counter() - last_report >= c.VIDEO_REPORT_INTERVAL:
+                    last_report = time.perf_counter()
+                    in_flight, queued, current, overall = stats.report()
+                    logger.info(
+                        "Videos: %d/%d done (%d errors), %d downloading, %d queued, %.1f MB/s (%.1f MB/s overall)",
+                        pbar.n, len(ids), error_count, in_flight, queued, current, overall,
+                    )
+                exporter.maybe_export()
+
+    overall = stats.report()[3]
+    exporter.export()
+
+    logger.info(
+        "Video download completed: Total %d, Errors %d, %.1f MB at %.1f MB/s.",
+        len(ids), error_count, stats.bytes / 1e6, overall,
+    )
+    return {"videos": len(ids), "errors": error_count, "bytes": stats.bytes}
 
 
 def parse_args(argv=None):
@@ -264,11 +444,13 @@ def parse_args(argv=None):
         default="all",
         help="Select which assets to download",
     )
+    add_shard_arguments(parser)
     return parser.parse_args(argv)
 
 
 def main(argv=None):
     args = parse_args(argv)
+    configure_shard(args.shard_index, args.num_shards)
     if args.download in {"transcripts", "all"}:
         logger.info("Starting transcript download...")
         download_transcripts(test_mode=args.test)
@@ -1,11 +1,29 @@
 import os
 import csv
+import hashlib
 import json
 import re
-import numpy as np
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 
 import conf as c  # Keeping original conf import name
+import segment_table
+from job_ledger import STAGE_SEGMENTS, STATUS_DONE, STATUS_EMPTY, get_ledger, is_segment_stage
+from sharding import temporary_path
+
+
+UNICODE_MAPPINGS = {
+    "\u201c": '"',
+    "\u201d": '"',
+    "\u2014": "-",
+    "\u2018": "'",
+    "\u2019": "'",
+    "\u2026": "...",
+    "\n": " ",
+    "\r": " ",
+}
+BRACKET_PATTERN = re.compile(r"\[.*?\]")
+# A segment whose values in these columns change needs its landmarks extracted again
+SEGMENT_CONTENT_COLUMNS = ("START_REALIGNED", "END_REALIGNED", "SENTENCE")
 
 
 def normalize_text(text):
@@ -19,27 +37,36 @@ def normalize_text(text):
     Returns:
         str: Cleaned and normalized text in lowercase
     """
-    unicode_mappings = {
-        "\u201c": '"',
-        "\u201d": '"',
-        "\u2014": "-",
-        "\u2018": "'",
-        "\u2019": "'",
-        "\u2026": "...",
-        "\n": " ",
-        "\r": " ",
-    }
+    return normalize_texts([text])[0]
+
+
+def normalize_texts(texts):
+    """
+    Normalizes many texts at once; each result equals normalize_text on that text.
+    Newlines inside a text become spaces, so the texts are joined with newlines
+    and every cleaning step runs once over the whole batch: no replacement
+    produces a character another one replaces, and bracketed content never
+    spans a newline.
+
+    Args:
+        texts (list): Input texts to be normalized
+
+    Returns:
+        list: Cleaned and normalized texts, in input order
+    """
+    text = "\n".join(text.replace("\n", " ") for text in texts)
 
     # Replace Unicode characters with ASCII equivalents
-    pattern = re.compile("|".join(map(re.escape, unicode_mappings)))
-    text = pattern.sub(lambda match: unicode_mappings[match.group()], text)
+    for source, target in UNICODE_MAPPINGS.items():
+        if source != "\n":
+            text = text.replace(source, target)
 
-    # Clean text using regex patterns
-    text = re.sub(r"[^\x00-\x7F]+", "", text)  # Remove non-ASCII
-    text = re.sub(r"\[.*?\]", "", text)  # Remove bracketed content
-    text = re.sub(r"\s+", " ", text)  # Standardize whitespace
+    # Clean text
+    text = text.encode("ascii", "ignore").decode("ascii")  # Remove non-ASCII
+    text = BRACKET_PATTERN.sub("", text)  # Remove bracketed content
 
-    return text.strip()
+    # Standardize whitespace
+    return [" ".join(line.split()) for line in text.split("\n")]
 
 
 def read_transcript_file(json_file):
@@ -76,10 +103,10 @@ def process_transcript_segments(transcripts, video_id):
         print(f"No valid transcripts for video {video_id}")
         return processed_segments
 
-    for entry in valid_entries:
-        # Get the normalized text
-        processed_text = normalize_text(entry["text"])
+    # Normalize all captions of the video in one pass
+    processed_texts = normalize_texts([entry["text"] for entry in valid_entries])
 
+    for entry, processed_text in zip(valid_entries, processed_texts):
         # Apply filtering criteria:
         # - Text length <= 300 characters
         # - Duration between 0.2s and 60s
@@ -100,6 +127,111 @@ def process_transcript_segments(transcripts, video_id):
     return processed_segments
 
 
+def format_column(values):
+    """
+    Formats one column of a video's segments as pandas' to_csv would: integers
+    as integers if the whole column is integral, numbers as floats otherwise.
+
+    Args:
+        values (list): Column values
+
+    Returns:
+        list: Values as strings
+    """
+    if all(type(value) is int for value in values):
+        return [str(value) for value in values]
+    if all(type(value) in (int, float) for value in values):
+        return [repr(float(value)) for value in values]
+    return [value if isinstance(value, str) else str(value) for value in values]
+
+
+def format_rows(segment_data, names):
+    """
+    Formats the segments of one video as CSV rows.
+
+    Args:
+        segment_data (list): List of segment dictionaries of one video
+        names (list): Column names, in CSV order
+
+    Returns:
+        list: Rows of strings
+    """
+    columns = [format_column([segment.get(name) for segment in segment_data]) for name in names]
+    return list(zip(*columns))
+
+
+def segment_writer(file):
+    """
+    Returns a csv.writer with the CSV dialect of the segment file.
+
+    Args:
+        file: Text file opened with newline=""
+    """
+    return csv.writer(file, delimiter="\t", quoting=csv.QUOTE_ALL, lineterminator=os.linesep)
+
+
+class SegmentWriter:
+    """
+    Appends segments to the CSV through a single open file and keeps the
+    appended columns for the columnar table (see segment_table.py). The file
+    is opened on the first write, so nothing is created without segments.
+    """
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.existed = os.path.exists(csv_path)
+        self.table_was_current = self.existed and segment_table.is_current(csv_path)
+        self.columns = {}
+        self.rows = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, segment_data):
+        """
+        Appends the segments of one video.
+
+        Args:
+            segment_data (list): List of segment dictionaries to save
+        """
+        names = list(segment_data[0])
+        if self._writer is None:
+            self._file = open(self.csv_path, "a", encoding="utf-8", newline="")
+            self._writer = segment_writer(self._file)
+            if not self.existed:
+                self._writer.writerow(names)
+        self._writer.writerows(format_rows(segment_data, names))
+        for name in names:
+            self.columns.setdefault(name, []).extend(segment.get(name) for segment in segment_data)
+        self.rows += len(segment_data)
+
+    def close(self):
+        """Closes the CSV and brings its columnar table up to date if enabled."""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if not c.SEGMENT_TABLE:
+            return
+        if not self.existed:
+            segment_table.write_table(self.csv_path, self.columns)
+            return
+        if self.table_was_current:
+            table = segment_table.read_table(self.csv_path)
+            if list(table) == list(self.columns):
+                segment_table.write_table(
+                    self.csv_path,
+                    {name: [*table[name], *self.columns[name]] for name in table},
+                )
+                return
+        segment_table.convert(self.csv_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
 def save_segments_to_csv(segment_data, csv_path):
     """
     Saves processed transcript segments to CSV file, appending if file exists.
@@ -108,47 +240,290 @@ def save_segments_to_csv(segment_data, csv_path):
         segment_data (list): List of segment dictionaries to save
         csv_path (str): Path to target CSV file
     """
-    df = pd.DataFrame(segment_data)
-    mode = "a" if os.path.exists(csv_path) else "w"
-    header = not os.path.exists(csv_path)
+    with SegmentWriter(csv_path) as writer:
+        writer.write(segment_data)
 
-    df.to_csv(
-        csv_path,
-        sep="\t",
-        mode=mode,
-        header=header,
-        index=False,
-        encoding="utf-8",
-        quoting=csv.QUOTE_ALL,
-    )
+
+def replace_video_segments(csv_path, segments_by_video):
+    """
+    Rewrites the CSV with the rows of the given videos replaced: each video's
+    new segments take the place of its first existing row and its other rows
+    are dropped. Videos without rows in the CSV are appended at the end. The
+    file is replaced atomically.
+
+    Old and new rows are matched by SENTENCE_NAME and compared on
+    SEGMENT_CONTENT_COLUMNS, as written to the CSV, to find the segments whose
+    downstream outputs are stale.
+
+    Args:
+        csv_path (str): Path to target CSV file
+        segments_by_video (dict): {video_id: segments}; empty lists delete a video's rows
+
+    Returns:
+        tuple: Number of segment rows written for the given videos, and the set
+            of SENTENCE_NAMEs of replaced rows that were changed or removed
+    """
+    tmp_path = temporary_path(csv_path)
+    written = set()
+    old_rows = {}
+    new_rows = {}
+    rows = 0
+    with open(csv_path, "r", encoding="utf-8", newline="") as in_file, \
+            open(tmp_path, "w", encoding="utf-8", newline="") as out_file:
+        reader = csv.reader(in_file, delimiter="\t")
+        writer = segment_writer(out_file)
+        names = next(reader)
+        if "VIDEO_NAME" not in names:
+            raise ValueError(f"Expected column 'VIDEO_NAME' in {csv_path}")
+        video_index = names.index("VIDEO_NAME")
+        name_index = names.index("SENTENCE_NAME") if "SENTENCE_NAME" in names else None
+        content_indices = [names.index(name) for name in SEGMENT_CONTENT_COLUMNS if name in names]
+
+        def content_of(row):
+            return [row[index] if len(row) > index else None for index in content_indices]
+
+        def write_video(segment_data):
+            if not segment_data:
+                return 0
+            formatted = format_rows(segment_data, names)
+            writer.writerows(formatted)
+            if name_index is not None:
+                new_rows.update((row[name_index], content_of(row)) for row in formatted)
+            return len(formatted)
+
+        writer.writerow(names)
+        for row in reader:
+            video_id = row[video_index] if len(row) > video_index else None
+            if video_id not in segments_by_video:
+                writer.writerow(row)
+                continue
+            if name_index is not None and len(row) > name_index:
+                old_rows[row[name_index]] = content_of(row)
+            if video_id not in written:
+                written.add(video_id)
+                rows += write_video(segments_by_video[video_id])
+        for video_id, segment_data in segments_by_video.items():
+            if video_id not in written:
+                rows += write_video(segment_data)
+    os.replace(tmp_path, csv_path)
+    if c.SEGMENT_TABLE:
+        segment_table.convert(csv_path)
+    changed_names = {name for name, content in old_rows.items() if new_rows.get(name) != content}
+    return rows, changed_names
+
+
+def transcript_path(video_id):
+    """Path of the JSON transcript of a video."""
+    return os.path.join(c.TRANSCRIPT_DIR, f"{video_id}.json")
+
+
+def transcript_digest(json_file):
+    """SHA-1 of a transcript file's bytes, as a hex string."""
+    digest = hashlib.sha1()
+    with open(json_file, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def transcript_fingerprint(json_file, recorded=None):
+    """
+    Identifies the content of a transcript file: a SHA-1 of its bytes if
+    c.TRANSCRIPT_FINGERPRINT is "sha1", otherwise its size and modification time
+    followed by that SHA-1. In the latter mode the file is only hashed when its
+    size or modification time differ from the `recorded` fingerprint; if they
+    match, `recorded` is returned unchanged.
+
+    Args:
+        json_file (str): Path to JSON transcript file
+        recorded (str): Fingerprint stored in the job ledger, if any
+
+    Returns:
+        str: Fingerprint recorded in the job ledger
+    """
+    if c.TRANSCRIPT_FINGERPRINT == "sha1":
+        return f"sha1:{transcript_digest(json_file)}"
+    stat = os.stat(json_file)
+    prefix = f"{stat.st_size}:{stat.st_mtime_ns}"
+    if recorded and ":".join(recorded.split(":")[:2]) == prefix:
+        return recorded
+    return f"{prefix}:{transcript_digest(json_file)}"
+
+
+def fingerprint_digest(fingerprint):
+    """
+    The content SHA-1 of a fingerprint, or None for stat fingerprints recorded
+    before the digest was stored with them.
+    """
+    parts = fingerprint.split(":") if fingerprint else []
+    if parts and (parts[0] == "sha1" or len(parts) == 3):
+        return parts[-1]
+    return None
+
+
+def plan_transcripts(video_ids, ledger):
+    """
+    Selects the transcripts an incremental run has to (re)segment: those whose
+    fingerprint differs from the one recorded when their segments were saved,
+    and those recorded with segments that are no longer in the CSV. Transcripts
+    whose size or modification time changed but whose content did not (e.g.
+    touched or copied) are not processed again; their new fingerprint is recorded.
+
+    Args:
+        video_ids (list): Video identifiers, in ID file order
+        ledger (JobLedger): Job ledger
+
+    Returns:
+        tuple: ({video_id: fingerprint} to process, set of video IDs with rows in the CSV)
+    """
+    csv_videos = set()
+    if os.path.exists(c.CSV_FILE):
+        csv_videos = set(segment_table.load_segment_columns(c.CSV_FILE, ["VIDEO_NAME"])["VIDEO_NAME"].dropna())
+    fingerprints = ledger.fingerprints(STAGE_SEGMENTS)
+    statuses = ledger.statuses(STAGE_SEGMENTS)
+
+    pending = {}
+    for video_id in video_ids:
+        json_file = transcript_path(video_id)
+        if video_id in pending or not os.path.exists(json_file):
+            continue
+        recorded = fingerprints.get(video_id)
+        fingerprint = transcript_fingerprint(json_file, recorded)
+        if recorded is not None and (statuses[video_id] == STATUS_EMPTY or video_id in csv_videos):
+            if fingerprint == recorded:
+                continue
+            digest = fingerprint_digest(fingerprint)
+            if digest is not None and digest == fingerprint_digest(recorded):
+                ledger.finish(
+                    STAGE_SEGMENTS,
+                    video_id,
+                    video_id=video_id,
+                    output_path=c.CSV_FILE,
+                    status=statuses[video_id],
+                    fingerprint=fingerprint,
+                )
+                continue
+        pending[video_id] = fingerprint
+    return pending, csv_videos
+
+
+def process_video_transcript(video_id):
+    """
+    Reads and segments the transcript of one video. Runs in a worker process.
+
+    Args:
+        video_id (str): Video identifier
+
+    Returns:
+        list: Processed transcript segments (empty if there are none), None on error
+    """
+    try:
+        json_file = transcript_path(video_id)
+        if not os.path.exists(json_file):
+            return []
+
+        transcript_data = read_transcript_file(json_file)
+        if not transcript_data:
+            return []
+
+        return process_transcript_segments(transcript_data, video_id)
+
+    except Exception as e:
+        print(f"Error processing {video_id}: {e}")
+        return None
+
+
+def save_incremental(video_ids, results, csv_videos, ledger):
+    """
+    Saves the segments of re-processed transcripts and records their fingerprints.
+    Videos that already have rows in the CSV get them replaced, the others are
+    appended. Segments that were replaced with different timestamps or text, or
+    removed, get their landmark and FPS reduction jobs marked failed in the
+    ledger for s3 and s4 to redo; unchanged segments keep their outputs.
+
+    Args:
+        video_ids (dict): {video_id: fingerprint} of the processed transcripts
+        results (iterable): Segments (or None on error) per video, in the order of video_ids
+        csv_videos (set): Video IDs with rows in the CSV
+        ledger (JobLedger): Job ledger
+
+    Returns:
+        int: Number of segment rows written
+    """
+    processed = {}
+    replacements = {}
+    with SegmentWriter(c.CSV_FILE) as writer:
+        for video_id, processed_segments in zip(video_ids, results):
+            if processed_segments is None:
+                ledger.fail(STAGE_SEGMENTS, video_id, "transcript could not be processed", video_id=video_id)
+                continue
+            processed[video_id] = len(processed_segments)
+            if video_id in csv_videos:
+                replacements[video_id] = processed_segments
+            elif processed_segments:
+                try:
+                    writer.write(processed_segments)
+                except Exception as e:
+                    print(f"Error processing {video_id}: {e}")
+                    del processed[video_id]
+    rows = writer.rows
+    if replacements:
+        replaced_rows, stale_names = replace_video_segments(c.CSV_FILE, replacements)
+        rows += replaced_rows
+        stages = [stage for stage in ledger.summary() if is_segment_stage(stage)]
+        invalidated = ledger.invalidate(stages, sorted(stale_names), "segments changed in the CSV")
+        print(f"Replaced the segments of {len(replacements)} changed videos "
+              f"({invalidated} landmark and FPS jobs to redo).")
+
+    # Recorded once the CSV holds the rows, so an interrupted run redoes them
+    for video_id, count in processed.items():
+        ledger.finish(
+            STAGE_SEGMENTS,
+            video_id,
+            video_id=video_id,
+            output_path=c.CSV_FILE,
+            status=STATUS_DONE if count else STATUS_EMPTY,
+            fingerprint=video_ids[video_id],
+        )
+    return rows
 
 
 def main():
     """
     Main function to process video transcripts into segmented CSV data.
-    Reads video IDs, processes their transcripts, and saves the results.
+    Reads video IDs, processes their transcripts in parallel, and saves the
+    results in video ID order. With c.TRANSCRIPT_INCREMENTAL, only new or
+    changed transcripts are processed and their rows are replaced in place.
     """
     with open(c.ID, "r", encoding="utf-8") as file:
         video_ids = [line.strip() for line in file if line.strip()]
 
-    print(f"Processing {len(video_ids)} videos.")
+    if c.TRANSCRIPT_INCREMENTAL:
+        ledger = get_ledger()
+        pending, csv_videos = plan_transcripts(video_ids, ledger)
+        print(f"Processing {len(pending)} new or changed transcripts of {len(video_ids)} videos.")
+        if not pending:
+            return
+        with ProcessPoolExecutor(max_workers=c.TRANSCRIPT_WORKERS) as executor:
+            results = executor.map(process_video_transcript, pending, chunksize=c.TRANSCRIPT_CHUNKSIZE)
+            rows = save_incremental(pending, results, csv_videos, ledger)
+        print(f"Saved {rows} segments to {c.CSV_FILE}.")
+        return
 
-    for video_id in video_ids:
-        try:
-            json_file = os.path.join(c.TRANSCRIPT_DIR, f"{video_id}.json")
-            if not os.path.exists(json_file):
-                continue
+    print(f"Processing {len(video_ids)} videos.")
 
-            transcript_data = read_transcript_file(json_file)
-            if not transcript_data:
+    with ProcessPoolExecutor(max_workers=c.TRANSCRIPT_WORKERS) as executor, \
+            SegmentWriter(c.CSV_FILE) as writer:
+        results = executor.map(process_video_transcript, video_ids, chunksize=c.TRANSCRIPT_CHUNKSIZE)
+        for video_id, processed_segments in zip(video_ids, results):
+            if not processed_segments:
                 continue
+            try:
+                writer.write(processed_segments)
+            except Exception as e:
+                print(f"Error processing {video_id}: {e}")
 
-            processed_segments = process_transcript_segments(transcript_data, video_id)
-            if processed_segments:
-                save_segments_to_csv(processed_segments, c.CSV_FILE)
-
-        except Exception as e:
-            print(f"Error processing {video_id}: {e}")
+    print(f"Saved {writer.rows} segments to {c.CSV_FILE}.")
 
 
 if __name__ == "__main__":
@@ -1,30 +1,76 @@
+import argparse
+import math
 import os
 import cv2
-import mediapipe as mp
 import numpy as np
 import pandas as pd
-from glob import glob
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import logging
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 import multiprocessing
-import gc
 import psutil
+import queue
+import threading
 import time
 import conf as c
+from job_ledger import STAGE_LANDMARKS, STATUS_EMPTY, get_ledger
+from landmark_store import list_landmarks, save_landmarks
+from metrics import METRICS, MetricsExporter
+import segment_table
+from s4_fps_reduce import calculate_frame_skip
+from sharding import add_shard_arguments, configure_shard, in_shard
+from video_probe import get_probe_cache
 
-logging.basicConfig(level=logging.DEBUG)
+# MediaPipe is imported by create_holistic_model on first use, so planning
+# (--plan-only) and the parent process never load it
+mp = None
+
+logging.basicConfig(level=c.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+# Holistic model owned by the current worker process, created once by init_worker
+_HOLISTIC = None
+
+# Output row layout: (results attribute, landmark indices, offset into the row)
+LANDMARK_LAYOUT = []
+for _attribute, _indices in (
+	("pose_landmarks", c.POSE_IDX),
+	("face_landmarks", c.FACE_IDX),
+	("left_hand_landmarks", c.HAND_IDX),
+	("right_hand_landmarks", c.HAND_IDX),
+):
+	_offset = 3 * sum(len(indices) for _, indices, _ in LANDMARK_LAYOUT)
+	LANDMARK_LAYOUT.append((_attribute, tuple(_indices), _offset))
+LANDMARK_DIM = 3 * sum(len(indices) for _, indices, _ in LANDMARK_LAYOUT)
+
+# Row layout as stored in each segment's metadata
+LANDMARK_LAYOUT_METADATA = [
+	{"part": attribute, "indices": list(indices), "offset": offset}
+	for attribute, indices, offset in LANDMARK_LAYOUT
+]
+
+# Per-video counters and timings reported by process_video
+PIPELINE_STATS = (
+	"frames_decoded",
+	"frames_inferred",
+	"frames_reused",
+	"segment_frames",
+	"segments_written",
+	"decode_wait_seconds",
+	"inference_seconds",
+	"write_seconds",
+	"wall_seconds",
+)
 
-def get_video_filenames(directory: str, pattern="*.mp4") -> List[str]:
+
+def read_video_fps(video_path: str) -> float:
 	"""
-    Retrieves video filenames from specified directory without extensions.
+    Returns a video's FPS from the probe cache, or 0.0 if the file is missing
+    or cannot be opened.
     """
-	return [
-		os.path.splitext(os.path.basename(f))[0]
-		for f in glob(os.path.join(directory, pattern))
-	]
+	probe = get_probe_cache().get(video_path)
+	return probe["fps"] if probe["valid"] else 0.0
 
 
 def validate_video_file(video_path: str) -> bool:
@@ -32,154 +78,879 @@ def validate_video_file(video_path: str) -> bool:
     Validates if a video file exists and can be opened by OpenCV.
     Returns True if valid, False otherwise.
     """
-	if not os.path.exists(video_path):
-		return False
-	
-	try:
-		cap = cv2.VideoCapture(video_path)
-		is_valid = cap.isOpened()
-		cap.release()
-		return is_valid
-	except Exception:
-		return False
+	return read_video_fps(video_path) > 0
+
+
+def create_holistic_model():
+	"""
+    Creates the MediaPipe Holistic model used for landmark extraction.
+    """
+	global mp
+	if mp is None:
+		import mediapipe as mp
+	return mp.solutions.holistic.Holistic(
+		model_complexity=1,
+		refine_face_landmarks=True,
+		min_detection_confidence=0.5,
+		min_tracking_confidence=0.5,
+	)
+
+
+def init_worker():
+	"""
+    Process pool initializer that loads one long-lived Holistic model per worker.
+    """
+	global _HOLISTIC
+	_HOLISTIC = create_holistic_model()
+
+
+def get_holistic_model():
+	"""
+    Returns the worker's Holistic model, creating it on first use outside the pool.
+    """
+	global _HOLISTIC
+	if _HOLISTIC is None:
+		_HOLISTIC = create_holistic_model()
+	return _HOLISTIC
 
 
 def process_mediapipe_detection(image, model):
 	"""
     Processes an image through MediaPipe detection model.
     """
-	return model.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+	with METRICS.timer("s3_color_convert"):
+		image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+	with METRICS.timer("s3_inference"):
+		return model.process(image)
 
 
-def extract_landmark_coordinates(results):
+def extract_landmark_coordinates(results, out=None):
 	"""
     Extracts landmark coordinates from MediaPipe detection results.
+    Writes into the preallocated row `out` (length LANDMARK_DIM) when given,
+    otherwise into a new array of dtype c.LANDMARK_DTYPE.
     """
+	if out is None:
+		out = np.empty(LANDMARK_DIM, dtype=c.LANDMARK_DTYPE)
 
-	def convert_landmarks_to_array(landmarks, indices):
-		return (
-			np.array(
-				[[landmarks[i].x, landmarks[i].y, landmarks[i].z] for i in indices]
+	# Extract landmarks for different body parts
+	for attribute, indices, offset in LANDMARK_LAYOUT:
+		target = out[offset:offset + 3 * len(indices)].reshape(-1, 3)
+		landmarks = getattr(getattr(results, attribute), "landmark", None)
+		if landmarks:
+			target[:] = [(lm.x, lm.y, lm.z) for lm in map(landmarks.__getitem__, indices)]
+		else:
+			target.fill(0)
+
+	return out
+
+
+class FramePreprocessor:
+	"""
+    Prepares decoded frames for inference within one video. Frames are optionally
+    cropped to the signer and downscaled so their longer side is at most
+    c.INFERENCE_MAX_SIDE pixels; MediaPipe landmarks are normalised, so
+    downscaling needs no correction. With c.SIGNER_CROP the crop box is taken
+    from the pose (and hand) landmarks every c.SIGNER_CROP_INTERVAL frames,
+    padded by c.SIGNER_CROP_MARGIN, and extracted landmarks are mapped back to
+    full-frame normalised coordinates. Until a pose is found the full frame is used.
+    """
+
+	def __init__(self, max_side=None, crop=False, interval=30, margin=0.25):
+		self.max_side = max_side
+		self.crop = crop
+		self.interval = max(1, interval)
+		self.margin = margin
+		self.frame_size = None
+		self.box = None  # Crop in pixels: (x0, y0, x1, y1)
+		self.frames_until_refresh = 0
+
+	def reset(self):
+		"""
+    Forgets the crop box, e.g. at a segment start.
+    """
+		self.box = None
+		self.frames_until_refresh = 0
+
+	def prepare(self, frame):
+		"""
+    Returns the image to run inference on: the current crop, downscaled.
+    """
+		height, width = frame.shape[:2]
+		self.frame_size = (width, height)
+		if self.box is not None:
+			x0, y0, x1, y1 = self.box
+			frame = frame[y0:y1, x0:x1]
+			height, width = frame.shape[:2]
+		if self.max_side and max(width, height) > self.max_side:
+			scale = self.max_side / max(width, height)
+			frame = cv2.resize(
+				frame,
+				(max(1, round(width * scale)), max(1, round(height * scale))),
+				interpolation=cv2.INTER_LINEAR,
 			)
-			if landmarks
-			else np.zeros((len(indices), 3))
+		return frame
+
+	def to_frame_coordinates(self, row, results):
+		"""
+    Maps an extracted landmark row from crop to full-frame normalised
+    coordinates in place. Parts that were not detected stay zero.
+    """
+		if self.box is None:
+			return row
+		x0, y0, x1, y1 = self.box
+		width, height = self.frame_size
+		scale = np.array([(x1 - x0) / width, (y1 - y0) / height, (x1 - x0) / width], dtype=row.dtype)
+		shift = np.array([x0 / width, y0 / height, 0.0], dtype=row.dtype)
+		for attribute, indices, offset in LANDMARK_LAYOUT:
+			if getattr(results, attribute, None) is not None:
+				target = row[offset:offset + 3 * len(indices)].reshape(-1, 3)
+				target *= scale
+				target += shift
+		return row
+
+	def update(self, results):
+		"""
+    Refreshes the crop box from this frame's results every `interval`
+    frames. Returns True when the box changed.
+    """
+		if not self.crop:
+			return False
+		self.frames_until_refresh -= 1
+		if self.frames_until_refresh > 0:
+			return False
+		self.frames_until_refresh = self.interval
+
+		points = []
+		for attribute in ("pose_landmarks", "left_hand_landmarks", "right_hand_landmarks"):
+			landmarks = getattr(getattr(results, attribute, None), "landmark", None)
+			if landmarks:
+				points.extend((lm.x, lm.y) for lm in landmarks)
+		box = self._box_from_points(points) if points else None
+		changed = box != self.box
+		self.box = box
+		return changed
+
+	def _box_from_points(self, points):
+		width, height = self.frame_size
+		points = np.clip(np.array(points, dtype=np.float64), 0.0, 1.0)
+		if self.box is not None:
+			# Points are relative to the current crop
+			x0, y0, x1, y1 = self.box
+			points = points * [(x1 - x0) / width, (y1 - y0) / height] + [x0 / width, y0 / height]
+		(left, top), (right, bottom) = points.min(axis=0), points.max(axis=0)
+		pad = self.margin * max(right - left, bottom - top)
+		box = (
+			int(max(0.0, left - pad) * width),
+			int(max(0.0, top - pad) * height),
+			int(np.ceil(min(1.0, right + pad) * width)),
+			int(np.ceil(min(1.0, bottom + pad) * height)),
 		)
+		# A degenerate box means the pose is unusable; fall back to the full frame
+		if box[2] - box[0] < 0.05 * width or box[3] - box[1] < 0.05 * height:
+			return None
+		return box
 
-	# Extract landmarks for different body parts
-	pose_landmarks = convert_landmarks_to_array(
-		getattr(results.pose_landmarks, "landmark", None), c.POSE_IDX
-	)
-	left_hand_landmarks = convert_landmarks_to_array(
-		getattr(results.left_hand_landmarks, "landmark", None), c.HAND_IDX
-	)
-	right_hand_landmarks = convert_landmarks_to_array(
-		getattr(results.right_hand_landmarks, "landmark", None), c.HAND_IDX
-	)
-	face_landmarks = convert_landmarks_to_array(
-		getattr(results.face_landmarks, "landmark", None), c.FACE_IDX
+
+class MotionGate:
+	"""
+    Skips inference on near-static frames. Each sampled frame is reduced to a
+    small greyscale thumbnail (c.MOTION_GATE_SIZE pixels wide) and compared with
+    the thumbnail of the last inferred frame. When the mean absolute difference
+    is below c.MOTION_GATE_THRESHOLD grey levels, that frame's landmarks are
+    reused, at most c.MOTION_GATE_MAX_REUSE times in a row.
+    """
+
+	def __init__(self, threshold, max_reuse, size=64):
+		self.threshold = threshold
+		self.max_reuse = max_reuse
+		self.size = size
+		self.reset()
+
+	def reset(self):
+		"""
+    Forgets the reference frame so the next frame is always inferred.
+    """
+		self.reference = None
+		self.landmarks = None
+		self.reused = 0
+		self._thumbnail = None
+
+	def thumbnail(self, frame):
+		height, width = frame.shape[:2]
+		# Striding first keeps the area resize cheap on large frames
+		stride = max(1, width // (4 * self.size))
+		small = cv2.resize(
+			frame[::stride, ::stride],
+			(self.size, max(1, round(self.size * height / width))),
+			interpolation=cv2.INTER_AREA,
+		)
+		return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+	def should_reuse(self, frame) -> bool:
+		self._thumbnail = self.thumbnail(frame)
+		if self.reference is None or self.reused >= self.max_reuse:
+			return False
+		if cv2.absdiff(self._thumbnail, self.reference).mean() >= self.threshold:
+			return False
+		self.reused += 1
+		return True
+
+	def remember(self, landmarks):
+		"""
+    Makes the frame just checked the reference, with its inferred landmarks.
+    """
+		self.reference = self._thumbnail
+		self.landmarks = landmarks.copy()
+		self.reused = 0
+
+
+def merge_intervals(spans, gap=0.0):
+	"""
+    Merges (start, end) spans into sorted disjoint intervals. Spans that overlap
+    or are separated by at most `gap` are joined.
+    """
+	merged = []
+	for start, end in sorted(spans):
+		if merged and start <= merged[-1][1] + gap:
+			merged[-1][1] = max(merged[-1][1], end)
+		else:
+			merged.append([start, end])
+	return [tuple(interval) for interval in merged]
+
+
+def plan_windows(windows, step, tolerance):
+	"""
+    Plans the sampling of a video's sorted (start, end, output_file) windows.
+    With c.MERGE_SEGMENT_INTERVALS, overlapping or back-to-back windows form one
+    interval whose sampling grid is anchored at the interval start, so every
+    window in it samples the same frames and each frame is inferred once; model
+    state is reset only where an interval starts. Otherwise each window has its
+    own grid and resets the model. Returns (start, end, output_file,
+    first_sample, starts_interval) per window.
+    """
+	planned = []
+	interval_start = interval_end = None
+	for start, end, output_file in windows:
+		starts_interval = interval_end is None or start > interval_end + step
+		if starts_interval:
+			interval_start, interval_end = start, end
+		else:
+			interval_end = max(interval_end, end)
+		if c.MERGE_SEGMENT_INTERVALS:
+			first_sample = interval_start + max(0, math.ceil((start - interval_start - tolerance) / step)) * step
+		else:
+			first_sample, starts_interval = start, True
+		planned.append((start, end, output_file, first_sample, starts_interval))
+	return planned
+
+
+class SegmentWindow:
+	"""
+    An open segment in the forward pass, with a preallocated landmark buffer
+    sized from the segment's expected number of sampled frames.
+    """
+
+	__slots__ = (
+		"start", "end", "output_file", "buffer", "positions", "count", "reused", "next_sample", "starts_interval",
+		"opened_at",
 	)
 
-	return np.concatenate([
-		pose_landmarks.flatten(),
-		face_landmarks.flatten(),
-		left_hand_landmarks.flatten(),
-		right_hand_landmarks.flatten(),
-	])
+	def __init__(self, start, end, output_file: str, step, first_sample=None, starts_interval=True):
+		self.start = start
+		self.end = end
+		self.output_file = output_file
+		self.next_sample = start if first_sample is None else first_sample
+		self.starts_interval = starts_interval
+		n_frames = int((end - start) / step) + 2
+		self.buffer = np.empty((n_frames, LANDMARK_DIM), dtype=c.LANDMARK_DTYPE)
+		self.positions = np.empty(n_frames)
+		self.count = 0
+		self.reused = 0
+		self.opened_at = time.perf_counter()
+
+	def next_row(self, position):
+		"""
+    Returns the next free buffer row for the frame at `position` (frame index
+    or seconds), growing the buffer if it is full.
+    """
+		if self.count == len(self.buffer):
+			grown = np.empty((2 * len(self.buffer), LANDMARK_DIM), dtype=self.buffer.dtype)
+			grown[:self.count] = self.buffer
+			self.buffer = grown
+			self.positions = np.resize(self.positions, 2 * len(self.positions))
+		row = self.buffer[self.count]
+		self.positions[self.count] = position
+		self.count += 1
+		return row
 
+	@property
+	def landmarks(self):
+		return self.buffer[:self.count]
 
-def process_video_segment(video_path: str, start_time: float, end_time: float, output_file: str):
+	@property
+	def sampled_positions(self):
+		return self.positions[:self.count]
+
+
+def sentence_name_of(path: str) -> str:
 	"""
-    Processes a video segment to extract holistic keypoints and save them.
+    Returns the file stem of a video or landmark path (VIDEO_NAME / SENTENCE_NAME).
+    """
+	return os.path.splitext(os.path.basename(path))[0]
+
+
+def segment_metadata(positions, fps: float, frame_skip: int, use_timestamps: bool, reused=0) -> dict:
+	"""
+    Describes how a segment was sampled, stored next to its landmarks so later
+    stages never have to probe the video or guess the settings used: source
+    fps, sampling step, the source frame index (frame sampling) and timestamp
+    of every row, and the row layout and dtype.
+    """
+	if use_timestamps:
+		frame_indices = None
+		timestamps = positions
+	else:
+		frame_indices = positions.astype(int).tolist()
+		timestamps = positions / fps
+	return {
+		"format_version": 1,
+		"source_fps": fps,
+		"frame_skip": frame_skip,
+		"sample_fps": fps / frame_skip,
+		"target_fps": c.EXTRACT_FPS,
+		"sampling_mode": "timestamp" if use_timestamps else "frame",
+		"frame_indices": frame_indices,
+		"timestamps": np.round(timestamps, 6).tolist(),
+		"reused_frames": reused,
+		"landmark_dim": LANDMARK_DIM,
+		"landmark_layout": LANDMARK_LAYOUT_METADATA,
+		"dtype": np.dtype(c.LANDMARK_DTYPE).name,
+	}
+
+
+def save_landmark_sequence(landmark_array, output_file: str, video_path: str, duration=None, reused=0,
+						   metadata=None):
+	"""
+    Saves a segment's landmark sequence if it contains valid data and records
+    the outcome in the job ledger. `reused` is the number of frames whose
+    landmarks were copied from an earlier frame by the motion gate; `metadata`
+    (see segment_metadata) is stored with the array.
+    """
+	if landmark_array.size > 0 and np.any(landmark_array):
+		save_landmarks(output_file, landmark_array, fsync=c.FSYNC_OUTPUT, metadata=metadata)
+		get_ledger().finish(STAGE_LANDMARKS, sentence_name_of(output_file), output_path=output_file, duration=duration)
+		if reused:
+			logger.info(f"Saved landmarks to {output_file} ({reused} of {len(landmark_array)} frames reused)")
+		else:
+			logger.info(f"Saved landmarks to {output_file}")
+	else:
+		get_ledger().finish(STAGE_LANDMARKS, sentence_name_of(output_file), duration=duration, status=STATUS_EMPTY)
+		logger.info(f"No valid landmarks for segment {video_path}, not saving.")
+
+
+def sampling_step(fps: float, extract_fps=None) -> int:
+	"""
+    Returns the number of source frames between sampled frames. Without an
+    extraction rate every c.FRAME_SKIP-th frame is sampled (every frame at 15 fps
+    or less). With one, the step also folds in the reduction s4 would apply to
+    that output, so only frames that survive s4 are inferred and the result
+    equals s3 followed by s4.
+    """
+	step = 1 if fps <= 15 else c.FRAME_SKIP
+	if extract_fps:
+		step *= calculate_frame_skip(fps / step, extract_fps)
+	return step
+
+
+def _put(work_queue, item, stop):
+	"""
+    Blocking put that gives up once `stop` is set, so a failed consumer never
+    leaves a producer thread stuck on a full queue.
+    """
+	while not stop.is_set():
+		try:
+			work_queue.put(item, timeout=0.1)
+			return True
+		except queue.Full:
+			continue
+	return False
+
+
+def decode_frames(cap, windows, use_timestamps: bool, step, tolerance, frame_queue, stop, stats):
+	"""
+    Decode stage: walks the video once, opens and closes segment windows, and
+    queues every frame that at least one open window samples. Emits
+    ("open", window), ("frame", frame, windows, position), ("close", window),
+    ("missing", output_file), ("error", exception) and finally ("end",).
+    """
+	try:
+		last_position = max(window[1] for window in windows)
+		current_frame = windows[0][0]
+		if use_timestamps:
+			cap.set(cv2.CAP_PROP_POS_MSEC, windows[0][0] * 1000)
+		else:
+			cap.set(cv2.CAP_PROP_POS_FRAMES, current_frame)
+
+		active = []
+		next_window = 0
+		while not stop.is_set():
+			with METRICS.timer("s3_decode"):
+				grabbed = cap.grab()
+			if not grabbed:
+				break
+			stats["frames_decoded"] += 1
+			position = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000 if use_timestamps else current_frame
+			if position > last_position + tolerance:
+				break
+
+			while next_window < len(windows) and windows[next_window][0] <= position + tolerance:
+				start, end, output_file, first_sample, starts_interval = windows[next_window]
+				window = SegmentWindow(start, end, output_file, step, first_sample, starts_interval)
+				active.append(window)
+				_put(frame_queue, ("open", window), stop)
+				next_window += 1
+
+			# Decode pixel data only when some open segment samples this frame
+			sampling = [window for window in active if position + tolerance >= window.next_sample]
+			if sampling:
+				with METRICS.timer("s3_retrieve"):
+					ret, frame = cap.retrieve()
+				if not ret:
+					break
+				_put(frame_queue, ("frame", frame, sampling, position), stop)
+				for window in sampling:
+					while window.next_sample <= position + tolerance:
+						window.next_sample += step
+
+			# Close segments whose window ends on this frame
+			still_open = []
+			for window in active:
+				if window.end <= position + tolerance:
+					_put(frame_queue, ("close", window), stop)
+				else:
+					still_open.append(window)
+			active = still_open
+
+			current_frame += 1
+
+		# Flush windows cut short by the end of the stream
+		for window in active:
+			_put(frame_queue, ("close", window), stop)
+		for window in windows[next_window:]:
+			_put(frame_queue, ("missing", window[2]), stop)
+
+	except Exception as e:
+		_put(frame_queue, ("error", e), stop)
+
+	finally:
+		_put(frame_queue, ("end",), stop)
+
+
+def write_segments(write_queue, video_path: str, pending, stats):
+	"""
+    Write stage: saves (and optionally fsyncs) closed segments in the
+    background until it receives None.
+    """
+	while True:
+		item = write_queue.get()
+		if item is None:
+			return
+		landmark_array, output_file, duration, reused, metadata = item
+		started = time.perf_counter()
+		try:
+			with METRICS.timer("s3_save"):
+				save_landmark_sequence(landmark_array, output_file, video_path, duration, reused, metadata)
+			stats["segments_written"] += 1
+		except Exception as e:
+			METRICS.inc("s3_segments_failed")
+			logger.error(f"Error saving {output_file}: {str(e)}")
+			get_ledger().fail(STAGE_LANDMARKS, sentence_name_of(output_file), e, video_id=sentence_name_of(video_path))
+		pending.discard(output_file)
+		stats["write_seconds"] += time.perf_counter() - started
+
+
+def process_video(video_path: str, segments: List[Tuple[float, float, str]]):
+	"""
+    Processes all segments of one video in a single forward decoding pass.
+    Each sampled frame is inferred once and its landmarks are appended to every
+    segment whose [start, end] window contains it. A segment is saved as soon
+    as its window closes. The worker's Holistic model is reused; overlapping
+    segments share one sampling grid and its tracking state is reset where a
+    group of overlapping segments starts (see plan_windows).
+
+    Frames are only grabbed; pixel data is retrieved for frames that at least one
+    segment samples. With c.SAMPLING_MODE == "timestamp", windows and the sampling
+    grid follow the container timestamps, so the rate holds on variable-frame-rate
+    files. Otherwise frames are counted. The sampling step comes from sampling_step,
+    so with c.EXTRACT_FPS set only frames kept at that rate are inferred.
+
+    Frames are cropped to the signer and downscaled before inference according
+    to c.INFERENCE_MAX_SIDE and c.SIGNER_CROP (see FramePreprocessor). With
+    c.MOTION_GATE_THRESHOLD set, near-static frames reuse the landmarks of the
+    last inferred frame instead (see MotionGate).
+
+    Decoding, inference and writing run as a pipeline: a decode thread feeds a
+    bounded frame queue (c.DECODE_QUEUE_SIZE), inference runs on the calling
+    thread, and a writer thread saves closed segments from a bounded write queue
+    (c.WRITE_QUEUE_SIZE). Returns per-stage counters and timings for the video.
     """
 	cap = None
-	holistic = None
+	decoder = None
+	writer = None
+	stop = threading.Event()
+	frame_queue = queue.Queue(maxsize=c.DECODE_QUEUE_SIZE)
+	write_queue = queue.Queue(maxsize=c.WRITE_QUEUE_SIZE)
+	ledger = get_ledger()
+	video_id = sentence_name_of(video_path)
+	pending = {output_file for _, _, output_file in segments}
+	stats = dict.fromkeys(PIPELINE_STATS, 0)
+	started = time.perf_counter()
 
 	try:
 		cap = cv2.VideoCapture(video_path)
 		if not cap.isOpened():
 			logger.error(f"Error opening video: {video_path}")
-			return
+			for output_file in pending:
+				ledger.fail(STAGE_LANDMARKS, sentence_name_of(output_file), "Error opening video", video_id=video_id)
+			return stats
 
-		# Determine frame skip rate based on video FPS
+		# Determine frame skip rate based on video FPS and the extraction rate
 		fps = cap.get(cv2.CAP_PROP_FPS)
-		frame_skip = 1 if fps <= 15 else c.FRAME_SKIP
+		frame_skip = sampling_step(fps, c.EXTRACT_FPS)
 
-		# Calculate frame ranges
-		start_frame, end_frame = int(start_time * fps), int(end_time * fps)
-		cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+		# Windows and sampling step in frames, or in seconds for timestamp sampling
+		use_timestamps = c.SAMPLING_MODE == "timestamp"
+		if use_timestamps:
+			windows = sorted(segments)
+			step = frame_skip / fps
+			tolerance = 0.5 / fps
+		else:
+			windows = sorted(
+				(int(start_time * fps), int(end_time * fps), output_file)
+				for start_time, end_time, output_file in segments
+			)
+			step = frame_skip
+			tolerance = 0.5
+		if not windows:
+			return stats
+		windows = plan_windows(windows, step, tolerance)
 
-		landmark_sequences = []
+		holistic = get_holistic_model()
+		preprocessor = FramePreprocessor(
+			max_side=c.INFERENCE_MAX_SIDE,
+			crop=c.SIGNER_CROP,
+			interval=c.SIGNER_CROP_INTERVAL,
+			margin=c.SIGNER_CROP_MARGIN,
+		)
+		gate = None
+		if c.MOTION_GATE_THRESHOLD is not None:
+			gate = MotionGate(c.MOTION_GATE_THRESHOLD, c.MOTION_GATE_MAX_REUSE, c.MOTION_GATE_SIZE)
 
-		# Create MediaPipe model
-		holistic = mp.solutions.holistic.Holistic(
-			model_complexity=1,
-			refine_face_landmarks=True,
-			min_detection_confidence=0.5,
-			min_tracking_confidence=0.5,
+		decoder = threading.Thread(
+			target=decode_frames,
+			args=(cap, windows, use_timestamps, step, tolerance, frame_queue, stop, stats),
+			daemon=True,
+		)
+		writer = threading.Thread(
+			target=write_segments, args=(write_queue, video_path, pending, stats), daemon=True
 		)
+		decoder.start()
+		writer.start()
 
-		current_frame = start_frame
-		while current_frame <= end_frame:
-			ret, frame = cap.read()
-			if not ret:
+		# Inference stage
+		while True:
+			wait_started = time.perf_counter()
+			event = frame_queue.get()
+			stats["decode_wait_seconds"] += time.perf_counter() - wait_started
+			kind = event[0]
+			if kind == "frame":
+				_, frame, sampling, position = event
+				inference_started = time.perf_counter()
+				with METRICS.timer("s3_motion_gate"):
+					reuse = gate is not None and gate.should_reuse(frame)
+				if reuse:
+					landmarks = sampling[0].next_row(position)
+					landmarks[:] = gate.landmarks
+					for window in sampling:
+						window.reused += 1
+					stats["frames_reused"] += 1
+				else:
+					with METRICS.timer("s3_preprocess"):
+						image = preprocessor.prepare(frame)
+					results = process_mediapipe_detection(image, holistic)
+					with METRICS.timer("s3_extract"):
+						landmarks = extract_landmark_coordinates(results, out=sampling[0].next_row(position))
+						preprocessor.to_frame_coordinates(landmarks, results)
+					if preprocessor.update(results):
+						# Tracked regions refer to the previous crop
+						holistic.reset()
+					if gate is not None:
+						gate.remember(landmarks)
+					stats["frames_inferred"] += 1
+				for window in sampling[1:]:
+					window.next_row(position)[:] = landmarks
+				stats["inference_seconds"] += time.perf_counter() - inference_started
+			elif kind == "open":
+				if event[1].starts_interval:
+					# Do not carry tracking state across an interval boundary
+					holistic.reset()
+					preprocessor.reset()
+					if gate is not None:
+						gate.reset()
+				ledger.start(STAGE_LANDMARKS, sentence_name_of(event[1].output_file), video_id=video_id)
+			elif kind == "close":
+				window = event[1]
+				stats["segment_frames"] += window.count
+				metadata = segment_metadata(window.sampled_positions, fps, frame_skip, use_timestamps, window.reused)
+				write_queue.put(
+					(window.landmarks, window.output_file, time.perf_counter() - window.opened_at, window.reused,
+					 metadata)
+				)
+			elif kind == "missing":
+				# The video has no frames for this window (e.g. an incomplete download). Unlike a
+				# window without landmarks it is recorded as failed, so it is retried next run
+				logger.warning(f"Segment {event[1]} lies beyond the end of {video_path}")
+				ledger.fail(
+					STAGE_LANDMARKS, sentence_name_of(event[1]), "Segment lies beyond the end of the video",
+					video_id=video_id,
+				)
+				pending.discard(event[1])
+			elif kind == "error":
+				raise event[1]
+			elif kind == "end":
 				break
 
-			if (current_frame - start_frame) % frame_skip == 0:
-				results = process_mediapipe_detection(frame, holistic)
-				landmark_sequences.append(extract_landmark_coordinates(results))
-
-			current_frame += 1
-
-		# Save landmarks if valid data exists
-		landmark_array = np.array(landmark_sequences)
-		if landmark_array.size > 0 and np.any(landmark_array):
-			os.makedirs(os.path.dirname(output_file), exist_ok=True)
-			np.save(output_file, landmark_array)
-			logger.info(f"Saved landmarks to {output_file}")
-		else:
-			logger.info(f"No valid landmarks for segment {video_path}, not saving.")
-
 	except Exception as e:
 		logger.error(f"Error processing {video_path}: {str(e)}")
 
 	finally:
-		# Ensure resource cleanup
+		# Stop the decode thread, let the writer drain, then release resources
+		stop.set()
+		if decoder is not None:
+			decoder.join()
+		if writer is not None:
+			write_queue.put(None)
+			writer.join()
+		for output_file in pending:
+			ledger.fail(STAGE_LANDMARKS, sentence_name_of(output_file), "Segment was not completed", video_id=video_id)
 		if cap is not None:
 			cap.release()
-		if holistic is not None:
-			holistic.close()
 
-		# Force garbage collection
-		gc.collect()
+		stats["wall_seconds"] = time.perf_counter() - started
+		if stats["frames_inferred"]:
+			logger.info(
+				f"{video_id}: {stats['frames_inferred']} frames inferred ({stats['frames_reused']} reused) "
+				f"for {stats['segment_frames']} segment frames in {stats['wall_seconds']:.1f}s "
+				f"({stats['frames_inferred'] / stats['wall_seconds']:.1f} frames/s), "
+				f"waited {stats['decode_wait_seconds']:.1f}s on decode, "
+				f"{stats['write_seconds']:.1f}s writing in background"
+			)
+
+		METRICS.inc("s3_videos_processed")
+		METRICS.inc("s3_frames_decoded", stats["frames_decoded"])
+		METRICS.inc("s3_frames_inferred", stats["frames_inferred"])
+		METRICS.inc("s3_frames_reused", stats["frames_reused"])
+		METRICS.inc("s3_segments_written", stats["segments_written"])
 
 		# Log memory usage
-		process = psutil.Process(os.getpid())
-		memory_info = process.memory_info()
-		logger.debug(f"Memory usage after processing: {memory_info.rss / 1024 / 1024:.2f} MB")
+		if logger.isEnabledFor(logging.DEBUG):
+			process = psutil.Process(os.getpid())
+			memory_info = process.memory_info()
+			logger.debug(f"Memory usage after processing: {memory_info.rss / 1024 / 1024:.2f} MB")
 
+	return stats
 
-def process_batch(task_batch):
+
+def process_video_task(video_path: str, segments: List[Tuple[float, float, str]]):
 	"""
-    Process a batch of tasks for bulk processing
+    Pool entry point: processes a video and returns its stats together with the
+    metrics this worker recorded since its previous task.
     """
-	for video_path, start, end, output_path in task_batch:
-		try:
-			process_video_segment(video_path, start, end, output_path)
-		except Exception as e:
-			logger.error(f"Error in batch processing: {str(e)}")
+	stats = process_video(video_path, segments)
+	return stats, METRICS.drain()
 
-		# Add small delay after each task to avoid resource contention
-		time.sleep(0.1)
 
+def process_video_segment(video_path: str, start_time: float, end_time: float, output_file: str):
+	"""
+    Processes a video segment to extract holistic keypoints and save them.
+    """
+	return process_video(video_path, [(start_time, end_time, output_file)])
 
-def main():
+
+def estimate_task_cost(segments, fps: float, extract_fps=None, merge=True) -> float:
 	"""
-    Main function to orchestrate video processing and landmark extraction.
+    Estimates a task's cost as the number of frames it will run inference on.
+    With `merge`, frames shared by overlapping or back-to-back segments are
+    counted once, as process_video infers them (c.MERGE_SEGMENT_INTERVALS).
     """
-	# Read CSV and detect column format
-	timestamp_data_full = pd.read_csv(c.CSV_FILE, delimiter="\t", on_bad_lines="skip")
-	columns = timestamp_data_full.columns.tolist()
-	
+	frame_skip = sampling_step(fps, extract_fps)
+	spans = [(start, max(start, end)) for start, end, _ in segments]
+	if merge and c.MERGE_SEGMENT_INTERVALS:
+		spans = merge_intervals(spans, gap=frame_skip / fps)
+	return sum(end - start for start, end in spans) * fps / frame_skip
+
+
+class WorkerBudget:
+	"""
+    Chooses how many tasks may run at once from measured worker RSS and the
+    memory still available, between 1 and `max_workers`. The budget grows by
+    one while there is room for another worker's peak RSS on top of
+    c.MEMORY_RESERVE_MB, and shrinks by one when the reserve is breached.
+    """
+
+	def __init__(self, initial: int, max_workers: int):
+		self.max_workers = max_workers
+		self.limit = max(1, min(initial, max_workers))
+		self.peak_worker_rss = 0
+		self.reserve = c.MEMORY_RESERVE_MB * 1024 * 1024
+
+	def update(self) -> int:
+		workers = psutil.Process(os.getpid()).children()
+		for worker in workers:
+			try:
+				self.peak_worker_rss = max(self.peak_worker_rss, worker.memory_info().rss)
+			except psutil.Error:
+				continue
+		available = psutil.virtual_memory().available
+
+		if available < self.reserve and self.limit > 1:
+			self.limit -= 1
+			logger.warning(
+				f"Available memory {available / 1024 / 1024:.0f} MB below reserve, "
+				f"lowering concurrent tasks to {self.limit}"
+			)
+		elif (
+			self.peak_worker_rss
+			and available - self.reserve > 2 * self.peak_worker_rss
+			and self.limit < self.max_workers
+		):
+			self.limit += 1
+			logger.debug(f"Raising concurrent tasks to {self.limit}")
+		return self.limit
+
+
+def fail_crashed_task(video_path: str, segments, error):
+	"""
+    Marks the segments of a task whose worker died as failed in the ledger,
+    except those the worker finished before it crashed.
+    """
+	ledger = get_ledger()
+	video_id = sentence_name_of(video_path)
+	for _, _, output_file in segments:
+		if not ledger.is_done(STAGE_LANDMARKS, sentence_name_of(output_file)):
+			ledger.fail(STAGE_LANDMARKS, sentence_name_of(output_file), error, video_id=video_id)
+
+
+def run_video_tasks(video_tasks, costs):
+	"""
+    Runs video tasks on persistent worker processes, longest estimated cost
+    first. Tasks are submitted one at a time as workers free up, so a worker
+    that finishes early immediately takes the next task instead of waiting for
+    a statically assigned slice. The number of tasks in flight follows
+    WorkerBudget. If a worker dies (e.g. a native crash in MediaPipe), its
+    task is marked failed and the worker is replaced. Returns the summed
+    pipeline stats.
+    """
+	order = sorted(range(len(video_tasks)), key=lambda i: costs[i], reverse=True)
+	available_cpus = multiprocessing.cpu_count() - 1  # Reserve one CPU core for the main process
+	max_workers = max(1, min(c.ADAPTIVE_MAX_WORKERS or available_cpus, available_cpus))
+	budget = WorkerBudget(initial=c.MAX_WORKERS, max_workers=max_workers)
+	totals = dict.fromkeys(PIPELINE_STATS, 0)
+	completed = 0
+	started = time.perf_counter()
+	exporter = MetricsExporter("s3")
+
+	# One single-process executor per worker: a pool forks all of its workers
+	# up front, each loading a Holistic model, whereas these are only started
+	# as the budget grows and stopped when it shrinks. A worker keeps its model
+	# across tasks, and a crash breaks only its own executor.
+	idle = []
+	in_flight = {}
+	try:
+		next_task = 0
+		while next_task < len(order) or in_flight:
+			while next_task < len(order) and len(in_flight) < budget.limit:
+				video_path, segments = video_tasks[order[next_task]]
+				executor = idle.pop() if idle else ProcessPoolExecutor(max_workers=1, initializer=init_worker)
+				try:
+					future = executor.submit(process_video_task, video_path, segments)
+				except BrokenProcessPool:
+					# The worker died while idle; the task goes to a new one
+					executor.shutdown(wait=False)
+					continue
+				in_flight[future] = (executor, video_path, segments)
+				next_task += 1
+
+			done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+			for future in done:
+				executor, video_path, segments = in_flight.pop(future)
+				completed += 1
+				try:
+					stats, worker_metrics = future.result()
+				except BrokenProcessPool as e:
+					logger.error(f"Worker process died while processing {video_path}: {e}")
+					fail_crashed_task(video_path, segments, f"Worker process died: {e}")
+					METRICS.inc("s3_worker_errors")
+					executor.shutdown(wait=False)
+					continue
+				except Exception as e:
+					logger.error(f"Error in worker process: {str(e)}")
+					METRICS.inc("s3_worker_errors")
+				else:
+					for key, value in stats.items():
+						totals[key] += value
+					METRICS.merge(worker_metrics)
+				idle.append(executor)
+			budget.update()
+			# Stop the workers the budget no longer has room for
+			while idle and len(idle) + len(in_flight) > budget.limit:
+				idle.pop().shutdown(wait=False)
+
+			elapsed = time.perf_counter() - started
+			METRICS.set_gauge("s3_frames_per_second", totals["frames_inferred"] / elapsed)
+			METRICS.set_gauge("s3_videos_remaining", len(order) - completed)
+			METRICS.set_gauge("s3_concurrent_tasks", budget.limit)
+			METRICS.set_gauge("s3_worker_processes", len(idle) + len(in_flight))
+			METRICS.set_gauge("s3_peak_worker_rss_bytes", budget.peak_worker_rss)
+			exporter.maybe_export()
+
+			if completed % c.PROGRESS_INTERVAL < len(done) or not (in_flight or next_task < len(order)):
+				logger.info(
+					f"Completed {completed}/{len(order)} videos, "
+					f"{totals['frames_inferred'] / elapsed:.1f} frames/s, "
+					f"{totals['segments_written']} segments, "
+					f"{budget.limit} concurrent tasks, "
+					f"peak worker RSS {budget.peak_worker_rss / 1024 / 1024:.0f} MB"
+				)
+	finally:
+		for executor in idle + [executor for executor, _, _ in in_flight.values()]:
+			executor.shutdown()
+
+	exporter.export()
+	return totals
+
+
+def parse_args(argv=None):
+	parser = argparse.ArgumentParser(description="Extract MediaPipe Holistic landmarks for caption segments")
+	parser.add_argument(
+		"--plan-only",
+		action="store_true",
+		help="Print the task summary and estimated frame count without extracting",
+	)
+	add_shard_arguments(parser)
+	return parser.parse_args(argv)
+
+
+def read_timestamp_chunks(csv_file: str, chunksize: int):
+	"""
+    Reads the timestamp CSV in chunks of the four columns planning needs,
+    renamed to VIDEO_NAME, SENTENCE_NAME, START and END. If the CSV has a
+    current columnar table (see segment_table.py), the columns are read from
+    it instead of parsing the CSV.
+    """
+	columns = segment_table.segment_columns(csv_file)
+
 	# Detect which timestamp columns are available
 	if "START" in columns and "END" in columns:
 		start_col, end_col = "START", "END"
@@ -189,103 +960,161 @@ def main():
 		logger.info("Using START_REALIGNED/END_REALIGNED columns for timestamps")
 	else:
 		raise ValueError("Neither START/END nor START_REALIGNED/END_REALIGNED columns found in CSV")
-	
-	# Select required columns and drop missing values
-	timestamp_data = timestamp_data_full[
-		["VIDEO_NAME", "SENTENCE_NAME", start_col, end_col]
-	].dropna()
 
-	video_files = get_video_filenames(c.VIDEO_DIR, pattern="*.mp4")
-	processed_files = get_video_filenames(c.NPY_DIR, pattern="*.npy")
+	usecols = ["VIDEO_NAME", "SENTENCE_NAME", start_col, end_col]
+	for chunk in segment_table.iter_segment_columns(csv_file, usecols, chunksize):
+		yield chunk.rename(columns={start_col: "START", end_col: "END"})
 
-	logger.info(f"Found {len(video_files)} video files")
 
-	# Create video validation cache
-	video_validation_cache = {}
+def plan_tasks(processed_files):
+	"""
+    Builds the extraction plan from c.CSV_FILE with vectorised filters, reading
+    the CSV in chunks of c.PLAN_CHUNK_ROWS rows so memory is bounded by the rows
+    still to process. Rows are dropped when they belong to another shard, are
+    already processed, last longer than 60s or point at an invalid video (from
+    the probe cache). Returns (video_tasks, video_fps_cache, summary).
+    """
+	summary = dict.fromkeys(("rows", "existing", "duration", "invalid_video"), 0)
+	video_fps = {}
 	invalid_videos = set()
-	skipped_due_to_invalid_video = 0
-	skipped_due_to_existing_file = 0
-	skipped_due_to_duration = 0
-
-	processing_tasks = []
-	for _, row in timestamp_data.iterrows():
-		video_name = row.VIDEO_NAME
-		sentence_name = row.SENTENCE_NAME
-		start, end = row[start_col], row[end_col]
-
-		video_path = os.path.join(c.VIDEO_DIR, f"{video_name}.mp4")
-		output_path = os.path.join(c.NPY_DIR, f"{sentence_name}.npy")
-
-		# Skip if output file already exists
-		if sentence_name in processed_files:
-			skipped_due_to_existing_file += 1
-			continue
-		
-		# Skip if duration is too long
-		if end - start > 60:
-			skipped_due_to_duration += 1
-			continue
-		
-		# Validate video file (use cache to avoid repeated checks)
-		if video_path not in video_validation_cache:
-			video_validation_cache[video_path] = validate_video_file(video_path)
-			if not video_validation_cache[video_path]:
-				invalid_videos.add(video_name)
-				logger.warning(f"Invalid or missing video file: {video_path}")
-		
-		if not video_validation_cache[video_path]:
-			skipped_due_to_invalid_video += 1
-			continue
-		
-		processing_tasks.append((video_path, start, end, output_path))
+	kept = []
+	for chunk in read_timestamp_chunks(c.CSV_FILE, c.PLAN_CHUNK_ROWS):
+		chunk = chunk.dropna()
+		if c.NUM_SHARDS > 1:
+			names = chunk.VIDEO_NAME.unique()
+			chunk = chunk[chunk.VIDEO_NAME.isin([name for name in names if in_shard(name)])]
+		summary["rows"] += len(chunk)
+
+		existing = chunk.SENTENCE_NAME.isin(processed_files)
+		summary["existing"] += int(existing.sum())
+		chunk = chunk[~existing]
+
+		too_long = (chunk.END - chunk.START) > 60
+		summary["duration"] += int(too_long.sum())
+		chunk = chunk[~too_long]
+
+		# Probe videos seen for the first time; only new or changed files are opened
+		new_names = [name for name in chunk.VIDEO_NAME.unique() if name not in video_fps]
+		if new_names:
+			paths = {name: os.path.join(c.VIDEO_DIR, f"{name}.mp4") for name in new_names}
+			probes = get_probe_cache().get_many(paths.values())
+			for name, path in paths.items():
+				probe = probes[path]
+				video_fps[name] = probe["fps"] if probe["valid"] else 0.0
+				if not video_fps[name]:
+					invalid_videos.add(name)
+					logger.warning(f"Invalid or missing video file: {path}")
+		fps = chunk.VIDEO_NAME.map(video_fps)
+		invalid = fps <= 0
+		summary["invalid_video"] += int(invalid.sum())
+		kept.append(chunk[~invalid])
+
+	tasks = pd.concat(kept, ignore_index=True) if kept else pd.DataFrame(
+		columns=["VIDEO_NAME", "SENTENCE_NAME", "START", "END"]
+	)
+	# Order rows by video (integer codes, not strings) and start time
+	video_codes, video_names = pd.factorize(tasks.VIDEO_NAME)
+	order = np.lexsort((tasks.END.to_numpy(), tasks.START.to_numpy(), video_codes))
+	tasks = tasks.iloc[order]
+	video_codes = video_codes[order]
+	output_paths = (os.path.join(c.NPY_DIR, "") + tasks.SENTENCE_NAME + ".npy").tolist()
+	segments = list(zip(tasks.START.tolist(), tasks.END.tolist(), output_paths))
+	video_paths = [os.path.join(c.VIDEO_DIR, f"{name}.mp4") for name in video_names]
+
+	# Group segments so each video is decoded once, or keep one task per segment
+	if c.GROUP_BY_VIDEO:
+		bounds = np.flatnonzero(np.diff(video_codes)) + 1
+		starts = [0, *bounds.tolist()]
+		ends = [*bounds.tolist(), len(segments)]
+		video_tasks = [
+			(video_paths[video_codes[i]], segments[i:j]) for i, j in zip(starts, ends) if j > i
+		]
+	else:
+		video_tasks = [
+			(video_paths[code], [segment]) for code, segment in zip(video_codes.tolist(), segments)
+		]
+
+	summary["tasks"] = len(segments)
+	summary["invalid_videos"] = sorted(invalid_videos)
+	video_fps_cache = {
+		os.path.join(c.VIDEO_DIR, f"{name}.mp4"): fps for name, fps in video_fps.items()
+	}
+	return video_tasks, video_fps_cache, summary
+
+
+def main(argv=None):
+	"""
+    Main function to orchestrate video processing and landmark extraction.
+    Returns the summed pipeline stats of all workers, or the task summary
+    with --plan-only.
+    """
+	args = parse_args(argv)
+	configure_shard(args.shard_index, args.num_shards)
+
+	# Finished sentences come from the ledger; the output store is scanned only to seed it
+	processed_files = get_ledger().done_keys(STAGE_LANDMARKS, bootstrap=lambda: list_landmarks(c.NPY_DIR))
+
+	if c.NUM_SHARDS > 1:
+		logger.info(f"Planning shard {c.SHARD_INDEX} of {c.NUM_SHARDS}")
+
+	plan_started = time.perf_counter()
+	video_tasks, video_fps_cache, summary = plan_tasks(processed_files)
 
 	# Log summary of skipped tasks
-	logger.info(f"Task summary:")
-	logger.info(f"  - Tasks to process: {len(processing_tasks)}")
-	logger.info(f"  - Skipped (existing files): {skipped_due_to_existing_file}")
-	logger.info(f"  - Skipped (duration > 60s): {skipped_due_to_duration}")
-	logger.info(f"  - Skipped (invalid videos): {skipped_due_to_invalid_video}")
-	if invalid_videos:
-		logger.warning(f"Invalid video files found: {', '.join(sorted(invalid_videos))}")
-
-	# Process in batches to avoid submitting too many tasks at once
-	BATCH_SIZE = 100  # Process 100 tasks per batch
-	MAX_WORKERS = min(c.MAX_WORKERS, multiprocessing.cpu_count() - 1)  # Reserve one CPU core
-
-	for i in range(0, len(processing_tasks), BATCH_SIZE):
-		batch = processing_tasks[i:i + BATCH_SIZE]
-		logger.info(
-			f"Processing batch {i // BATCH_SIZE + 1}, tasks {i + 1} to {min(i + BATCH_SIZE, len(processing_tasks))}")
-
-		# Further subdivide batches for different processes
-		tasks_per_worker = len(batch) // MAX_WORKERS + 1
-		worker_batches = [batch[j:j + tasks_per_worker] for j in range(0, len(batch), tasks_per_worker)]
-
-		with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-			futures = []
-			for worker_batch in worker_batches:
-				if worker_batch:  # Ensure batch is not empty
-					future = executor.submit(process_batch, worker_batch)
-					futures.append(future)
-
-			# Wait for all tasks to complete
-			for future in futures:
-				try:
-					future.result()
-				except Exception as e:
-					logger.error(f"Error in worker process: {str(e)}")
+	logger.info(f"Task summary (planned in {time.perf_counter() - plan_started:.1f}s):")
+	planned_videos = len({video_path for video_path, _ in video_tasks})
+	logger.info(f"  - Tasks to process: {summary['tasks']} of {planned_videos} videos")
+	logger.info(f"  - Skipped (existing files): {summary['existing']}")
+	logger.info(f"  - Skipped (duration > 60s): {summary['duration']}")
+	logger.info(f"  - Skipped (invalid videos): {summary['invalid_video']}")
+	if summary["invalid_videos"]:
+		logger.warning(f"Invalid video files found: {', '.join(summary['invalid_videos'])}")
+	if c.GROUP_BY_VIDEO:
+		logger.info(f"  - Videos to decode: {len(video_tasks)}")
 
-		# Add delay between batches to allow system time to release resources
-		time.sleep(0.5)
+	# Longest tasks first, sized to the memory actually available
+	costs = [
+		estimate_task_cost(segments, video_fps_cache[video_path], c.EXTRACT_FPS)
+		for video_path, segments in video_tasks
+	]
+	summary["estimated_frames"] = sum(costs)
+	logger.info(f"  - Estimated frames to infer: {sum(costs):.0f}")
+	if c.MERGE_SEGMENT_INTERVALS:
+		per_segment = sum(
+			estimate_task_cost(segments, video_fps_cache[video_path], c.EXTRACT_FPS, merge=False)
+			for video_path, segments in video_tasks
+		)
+		if per_segment:
+			logger.info(
+				f"  - Merging overlapping segments saves {per_segment - sum(costs):.0f} inferences "
+				f"({100 * (1 - sum(costs) / per_segment):.0f}% of inferring each segment separately)"
+			)
+	if c.EXTRACT_FPS:
+		full_rate = sum(
+			estimate_task_cost(segments, video_fps_cache[video_path])
+			for video_path, segments in video_tasks
+		)
+		if full_rate:
+			logger.info(
+				f"  - Extracting at {c.EXTRACT_FPS:g} fps skips {full_rate - sum(costs):.0f} inferences "
+				f"({100 * (1 - sum(costs) / full_rate):.0f}% of the full FRAME_SKIP rate)"
+			)
 
-		# Force garbage collection
-		gc.collect()
+	if args.plan_only:
+		return summary
 
-		# Log progress and memory usage
-		process = psutil.Process(os.getpid())
-		memory_info = process.memory_info()
-		logger.info(f"Batch {i // BATCH_SIZE + 1} completed. Memory usage: {memory_info.rss / 1024 / 1024:.2f} MB")
+	totals = run_video_tasks(video_tasks, costs)
 
+	# Log overall throughput and memory usage
+	process = psutil.Process(os.getpid())
+	memory_info = process.memory_info()
+	logger.info(
+		f"All tasks completed: {totals['frames_inferred']} frames inferred, "
+		f"{totals['frames_reused']} reused by the motion gate, "
+		f"{totals['segment_frames']} segment frames, "
+		f"{totals['segments_written']} segments written. Memory usage: {memory_info.rss / 1024 / 1024:.2f} MB"
+	)
+	return totals
 
 if __name__ == "__main__":
 	main()
\ No newline at end of file
@@ -1,35 +1,94 @@
+import argparse
 import os
 import numpy as np
-import cv2
 from glob import glob
 from typing import Dict, List, Tuple
 import logging
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import time
 
 import conf as c
+from job_ledger import STAGE_LANDMARKS, STATUS_DONE, fps_stage, get_ledger
+from landmark_store import list_landmarks, load_landmark_metadata, load_landmarks, save_landmarks
+from metrics import METRICS, MetricsExporter
+from sharding import add_shard_arguments, configure_shard, in_shard
+from video_probe import get_probe_cache
 
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=c.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
 
 def get_video_fps(video_path: str) -> float:
     """
-    Get the FPS of a video file.
+    Get the FPS of a video file from the probe cache. The video is only opened
+    if it has not been probed yet (or changed since).
     
     Args:
         video_path (str): Path to the video file
         
     Returns:
-        float: FPS of the video
+        float: FPS of the video, 0.0 if it cannot be opened
     """
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
+    probe = get_probe_cache().get(video_path)
+    if not probe["valid"]:
         logger.error(f"Error opening video: {video_path}")
         return 0.0
+    return probe["fps"]
+
+
+def get_video_id(sentence_name: str, video_ids: Dict[str, str] = None) -> str:
+    """
+    Get the video ID of a segment.
     
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    cap.release()
-    return fps
+    Args:
+        sentence_name (str): SENTENCE_NAME of the segment (format: video_id-segment_id)
+        video_ids (Dict[str, str]): Known SENTENCE_NAME -> video ID mapping (from the ledger)
+        
+    Returns:
+        str: Video ID; YouTube IDs may themselves contain "-"
+    """
+    if video_ids and sentence_name in video_ids:
+        return video_ids[sentence_name]
+    return sentence_name.rsplit("-", 1)[0]
+
+
+def get_source_video_path(npy_file: str, video_id: str = None) -> str:
+    """
+    Get the source video of a landmark file.
+    
+    Args:
+        npy_file (str): Path to the npy file (format: video_id-segment_id.npy)
+        video_id (str): Video ID, if already known
+        
+    Returns:
+        str: Path to the source video
+    """
+    if video_id is None:
+        video_id = get_video_id(os.path.splitext(os.path.basename(npy_file))[0])
+    return os.path.join(c.VIDEO_DIR, f"{video_id}.mp4")
+
+
+def get_output_dir(target_fps: float) -> str:
+    """
+    Get the directory reduced landmark arrays are written to.
+    
+    Args:
+        target_fps (float): Target FPS of the reduction
+        
+    Returns:
+        str: Output directory
+    """
+    return f"{c.ROOT}/dataset/npy_fps{target_fps:g}/"
+
+
+def get_target_fps_list() -> List[float]:
+    """
+    Get every rate Step 4 writes: TARGET_FPS followed by EXTRA_TARGET_FPS.
+    
+    Returns:
+        List[float]: Target FPS values without duplicates
+    """
+    return list(dict.fromkeys(float(fps) for fps in [c.TARGET_FPS, *c.EXTRA_TARGET_FPS]))
 
 
 def get_npy_filenames(directory: str, pattern="*.npy") -> List[str]:
@@ -65,7 +124,140 @@ def calculate_frame_skip(original_fps: float, target_fps: float) -> int:
     return max(1, int(original_fps / target_fps))
 
 
-def reduce_fps_npy(npy_file: str, video_path: str, target_fps: float, output_dir: str):
+def sample_positions(num_frames: int, original_fps: float, target_fps: float, method: str = None,
+                     timestamps: List[float] = None) -> np.ndarray:
+    """
+    Calculate the source rows of a resampled sequence. Output frame k lies at
+    time k / target_fps after the first frame; the last one is at or before the
+    last source frame.
+    
+    Args:
+        num_frames (int): Number of source frames
+        original_fps (float): Rate of the source frames
+        target_fps (float): Target FPS to achieve
+        method (str): "skip" keeps every calculate_frame_skip-th row, "nearest"
+            takes the row closest to each output timestamp and "linear"
+            returns fractional positions to interpolate at (default: c.RESAMPLE_METHOD)
+        timestamps (List[float]): Source timestamp of every row in seconds (from
+            the sequence's metadata); rows are assumed evenly spaced without them
+        
+    Returns:
+        np.ndarray: Source positions (in rows) of the output frames, never more than the input
+    """
+    method = method or c.RESAMPLE_METHOD
+    if method == "skip":
+        return np.arange(0, num_frames, calculate_frame_skip(original_fps, target_fps), dtype=float)
+    if method not in ("nearest", "linear"):
+        raise ValueError(f"Unknown resampling method: {method}")
+    if target_fps >= original_fps or num_frames < 2:
+        return np.arange(num_frames, dtype=float)
+
+    if timestamps is not None:
+        timestamps = np.asarray(timestamps, dtype=float)
+        num_out = int(np.floor((timestamps[-1] - timestamps[0]) * target_fps + 1e-9)) + 1
+        target_times = timestamps[0] + np.arange(num_out) / target_fps
+        positions = np.interp(target_times, timestamps, np.arange(num_frames))
+    else:
+        num_out = int(np.floor((num_frames - 1) * target_fps / original_fps + 1e-9)) + 1
+        positions = np.arange(num_out) * (original_fps / target_fps)
+    if method == "nearest":
+        positions = np.minimum(np.floor(positions + 0.5), num_frames - 1)
+    return positions
+
+
+def interpolate_rows(landmark_data: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """
+    Take the rows at `positions`, interpolating linearly at fractional ones.
+    Missing body parts are stored as zeros and are never blended with detected
+    ones; the nearest row is used instead.
+    
+    Args:
+        landmark_data (np.ndarray): Landmark rows
+        positions (np.ndarray): Row positions from sample_positions
+        
+    Returns:
+        np.ndarray: New array of the selected rows
+    """
+    lower = np.floor(positions).astype(np.intp)
+    weight = positions - lower
+    if not weight.any():
+        # Fancy indexing copies only the selected rows out of a memory map
+        return landmark_data[lower]
+
+    upper = np.minimum(lower + 1, len(landmark_data) - 1)
+    nearest = np.where(weight < 0.5, lower, upper)
+    before = landmark_data[lower].astype(np.float32)
+    after = landmark_data[upper].astype(np.float32)
+    reduced_data = before + (after - before) * weight[:, None].astype(np.float32)
+    missing = (before == 0) | (after == 0)
+    reduced_data[missing] = landmark_data[nearest][missing]
+    return reduced_data.astype(landmark_data.dtype, copy=False)
+
+
+def resample_landmarks(landmark_data: np.ndarray, original_fps: float, target_fps: float,
+                       method: str = None, timestamps: List[float] = None) -> np.ndarray:
+    """
+    Resample a landmark sequence to the target FPS (see sample_positions).
+    
+    Args:
+        landmark_data (np.ndarray): Landmark rows sampled at original_fps
+        original_fps (float): Rate of the landmark rows
+        target_fps (float): Target FPS to achieve
+        method (str): "skip", "nearest" or "linear" (default: c.RESAMPLE_METHOD)
+        timestamps (List[float]): Source timestamp of every row, if known
+        
+    Returns:
+        np.ndarray: Resampled rows
+    """
+    positions = sample_positions(len(landmark_data), original_fps, target_fps, method, timestamps)
+    return interpolate_rows(landmark_data, positions)
+
+
+def resampled_metadata(metadata: dict, positions: np.ndarray, original_fps: float, target_fps: float,
+                       method: str = None) -> dict:
+    """
+    Derive the metadata of a resampled sequence from its input's. The output's
+    sample_fps is the rate of its rows and frame_skip the number of source
+    frames between them; resample_step is the number of input rows per output row.
+    
+    Args:
+        metadata (dict): Metadata of the input sequence; None for arrays
+            extracted before metadata was stored
+        positions (np.ndarray): Source rows of the output (from sample_positions)
+        original_fps (float): Rate of the input rows
+        target_fps (float): Target FPS of the output
+        method (str): Resampling method used (default: c.RESAMPLE_METHOD)
+        
+    Returns:
+        dict: Metadata of the output sequence
+    """
+    method = method or c.RESAMPLE_METHOD
+    resampled = dict(metadata or {"format_version": 1, "sample_fps": original_fps})
+    timestamps = resampled.get("timestamps")
+    if timestamps:
+        resampled["timestamps"] = np.round(np.interp(positions, np.arange(len(timestamps)), timestamps), 6).tolist()
+    else:
+        resampled["timestamps"] = np.round(positions / original_fps, 6).tolist()
+    frame_indices = resampled.get("frame_indices")
+    if frame_indices and not (positions % 1).any():
+        resampled["frame_indices"] = [frame_indices[int(position)] for position in positions]
+    else:
+        resampled["frame_indices"] = None
+    if method == "skip":
+        resample_step = calculate_frame_skip(original_fps, target_fps)
+    else:
+        resample_step = max(1.0, original_fps / target_fps)
+    resampled["sample_fps"] = original_fps / resample_step
+    resampled["resample_step"] = resample_step
+    if resampled.get("frame_skip"):
+        resampled["frame_skip"] = resampled["frame_skip"] * resample_step
+    resampled["target_fps"] = target_fps
+    resampled["resample_method"] = method
+    return resampled
+
+
+def reduce_fps_npy(npy_file: str, video_path: str, target_fps: float, output_dir: str,
+                   original_fps: float = None, method: str = None):
     """
     Reduce FPS of landmark data stored in npy file.
     
@@ -74,43 +266,104 @@ def reduce_fps_npy(npy_file: str, video_path: str, target_fps: float, output_dir
         video_path (str): video_path to get original FPS
         target_fps (float): Target FPS to achieve
         output_dir (str): Directory to save reduced FPS files
+        original_fps (float): FPS of the source video; looked up from the probe
+            cache when not given
+        method (str): Resampling method (default: c.RESAMPLE_METHOD)
     """
-    try:
-        # Load the npy file
-        landmark_data = np.load(npy_file)
-        
-        # Get original video FPS
-        original_fps = get_video_fps(video_path)
-        
-        if original_fps == 0:
-            logger.error(f"Could not get FPS for video: {video_path}")
-            return
-        if c.FRAME_SKIP != 1:
-            logger.warning(f"Applying frame skip factor: {c.FRAME_SKIP} to original FPS: {original_fps}")
-            original_fps = original_fps / c.FRAME_SKIP
-        
-        # Calculate frame skip
-        frame_skip = calculate_frame_skip(original_fps, target_fps)
-        
-        # Apply frame skip to reduce data
-        reduced_data = landmark_data[::frame_skip]
-        
-        # Create output filename
-        filename = os.path.basename(npy_file)
-        output_file = os.path.join(output_dir, f"{filename}")
-        
-        # Save reduced data
-        os.makedirs(output_dir, exist_ok=True)
-        np.save(output_file, reduced_data)
+    resample_npy(npy_file, video_path, [(target_fps, output_dir)], original_fps, method)
+
 
-        logger.info(f"File: {filename} from {len(landmark_data)} to {len(reduced_data)}")
-        logger.info(f"Saved to: {output_file}")
+def resample_npy(npy_file: str, video_path: str, targets: List[Tuple[float, str]],
+                 original_fps: float = None, method: str = None):
+    """
+    Resample landmark data stored in npy file to several target rates from a
+    single read. The rate and timestamps of the rows come from the metadata s3
+    stored with them; the source video's FPS (and the current c.FRAME_SKIP) is
+    only used for arrays extracted before metadata was stored.
+    
+    Args:
+        npy_file (str): Path to input npy file
+        video_path (str): video_path to get original FPS
+        targets (List[Tuple[float, str]]): (target FPS, output directory) pairs
+        original_fps (float): FPS of the source video; looked up from the probe
+            cache when not given and needed
+        method (str): Resampling method (default: c.RESAMPLE_METHOD)
+    """
+    ledger = get_ledger()
+    sentence_name = os.path.splitext(os.path.basename(npy_file))[0]
+    filename = os.path.basename(npy_file)
+    for target_fps, _ in targets:
+        ledger.start(fps_stage(target_fps), sentence_name)
+    started = time.perf_counter()
+    try:
+        # Map the landmark array; only the rows kept below are read
+        with METRICS.timer("s4_load"):
+            landmark_data = load_landmarks(npy_file, mmap=True)
+            metadata = load_landmark_metadata(npy_file)
         
+        if metadata is not None:
+            original_fps = metadata["sample_fps"]
+            timestamps = metadata.get("timestamps")
+        else:
+            # Get original video FPS
+            if original_fps is None:
+                original_fps = get_video_fps(video_path)
+            
+            if original_fps == 0:
+                logger.error(f"Could not get FPS for video: {video_path}")
+                for target_fps, _ in targets:
+                    ledger.fail(fps_stage(target_fps), sentence_name, f"Could not get FPS for video: {video_path}")
+                METRICS.inc("s4_files_failed")
+                return
+            if c.FRAME_SKIP != 1:
+                logger.warning(f"Applying frame skip factor: {c.FRAME_SKIP} to original FPS: {original_fps}")
+                original_fps = original_fps / c.FRAME_SKIP
+            timestamps = None
+            METRICS.inc("s4_files_without_metadata")
+        METRICS.inc("s4_files_read")
+        METRICS.inc("s4_frames_in", len(landmark_data))
+        METRICS.inc("s4_bytes_in", landmark_data.nbytes)
     except Exception as e:
         logger.error(f"Error processing {npy_file}: {e}")
+        for target_fps, _ in targets:
+            ledger.fail(fps_stage(target_fps), sentence_name, e, duration=time.perf_counter() - started)
+        METRICS.inc("s4_files_failed")
+        return
+
+    for target_fps, output_dir in targets:
+        stage = fps_stage(target_fps)
+        target_started = time.perf_counter()
+        try:
+            # Resample, copying only the needed rows out of the mapping
+            with METRICS.timer("s4_resample"):
+                positions = sample_positions(len(landmark_data), original_fps, target_fps, method, timestamps)
+                reduced_data = interpolate_rows(landmark_data, positions)
+            
+            # Create output filename
+            output_file = os.path.join(output_dir, f"{filename}")
+            
+            # Save reduced data
+            with METRICS.timer("s4_save"):
+                save_landmarks(
+                    output_file, reduced_data,
+                    metadata=resampled_metadata(metadata, positions, original_fps, target_fps, method),
+                )
+            ledger.finish(stage, sentence_name, output_path=output_file, duration=time.perf_counter() - target_started)
 
+            METRICS.inc("s4_files_reduced")
+            METRICS.inc("s4_frames_out", len(reduced_data))
+            METRICS.inc("s4_bytes_out", reduced_data.nbytes)
+            logger.info(f"File: {filename} from {len(landmark_data)} to {len(reduced_data)} ({target_fps:g} fps)")
+            logger.info(f"Saved to: {output_file}")
+            
+        except Exception as e:
+            logger.error(f"Error processing {npy_file} at {target_fps:g} fps: {e}")
+            ledger.fail(stage, sentence_name, e, duration=time.perf_counter() - target_started)
+            METRICS.inc("s4_files_failed")
 
-def process_fps_reduction(npy_file: str, target_fps: float, output_dir: str):
+
+def process_fps_reduction(npy_file: str, target_fps: float, output_dir: str, original_fps: float = None,
+                          method: str = None):
     """
     Process a single npy file for FPS reduction.
     
@@ -118,39 +371,181 @@ def process_fps_reduction(npy_file: str, target_fps: float, output_dir: str):
         npy_file (str): Path to the npy file
         target_fps (float): Target FPS to achieve
         output_dir (str): Output directory for reduced files
+        original_fps (float): FPS of the source video, if already known
+        method (str): Resampling method (default: c.RESAMPLE_METHOD)
+
+    Returns:
+        dict: Metrics recorded by this worker since its previous task
     """
-    # Extract video ID from filename (format: video_id-segment_id.npy)
-    filename = os.path.basename(npy_file)
-    video_id = filename.split("-")[0]
-    video_path = os.path.join(c.VIDEO_DIR, f"{video_id}.mp4")
+    video_path = get_source_video_path(npy_file)
+    return process_video_reduction([(npy_file, [(target_fps, output_dir)])], video_path, original_fps, method)
+
+
+def process_video_reduction(jobs: List[Tuple[str, List[Tuple[float, str]]]], video_path: str,
+                            original_fps: float = None, method: str = None):
+    """
+    Process every npy file of one source video. The video's FPS is only
+    needed for arrays without metadata.
     
-    reduce_fps_npy(npy_file, video_path, target_fps, output_dir)
+    Args:
+        jobs (List[Tuple[str, List[Tuple[float, str]]]]): npy file paths of the
+            video, each with the (target FPS, output directory) pairs it still needs
+        video_path (str): Path to the source video
+        original_fps (float): FPS of the source video, if already known
+        method (str): Resampling method (default: c.RESAMPLE_METHOD)
+
+    Returns:
+        dict: Metrics recorded by this worker since its previous task
+    """
+    for npy_file, targets in jobs:
+        resample_npy(npy_file, video_path, targets, original_fps, method)
+    return METRICS.drain()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reduce the frame rate of extracted landmark arrays")
+    parser.add_argument(
+        "--target-fps",
+        type=float,
+        nargs="+",
+        help="Rates to write in one pass (default: conf.TARGET_FPS and conf.EXTRA_TARGET_FPS)",
+    )
+    parser.add_argument(
+        "--method",
+        choices=["skip", "nearest", "linear"],
+        help="Resampling method (default: conf.RESAMPLE_METHOD)",
+    )
+    add_shard_arguments(parser)
+    return parser.parse_args(argv)
 
 
-def main():
+def main(argv=None):
     """
     Main function to orchestrate FPS reduction of npy files.
     """
+    args = parse_args(argv)
+    configure_shard(args.shard_index, args.num_shards)
+    method = args.method or c.RESAMPLE_METHOD
+
     # Configuration
     INPUT_DIR = c.NPY_DIR  # Use existing npy files as input
-    TARGET_FPS = c.TARGET_FPS  # Target FPS for reduction
-    OUTPUT_DIR = f"{c.ROOT}/dataset/npy_fps{TARGET_FPS:.0f}/"
+    TARGET_FPS = list(dict.fromkeys(args.target_fps)) if args.target_fps else get_target_fps_list()
+    OUTPUT_DIRS = {target_fps: get_output_dir(target_fps) for target_fps in TARGET_FPS}
+
+    if c.EXTRACT_FPS:
+        logger.info(
+            f"Step 3 already extracts landmarks at {c.EXTRACT_FPS:g} fps (conf.EXTRACT_FPS); "
+            f"unset it to reduce full-rate landmarks here"
+        )
+        return
     
-    # Get all npy files
-    npy_files = glob(os.path.join(INPUT_DIR, "*.npy"))
+    # Inputs and finished outputs come from the job ledger; the stores are only
+    # scanned to seed it on first use
+    ledger = get_ledger()
+    ledger.done_keys(STAGE_LANDMARKS, bootstrap=lambda: list_landmarks(INPUT_DIR))
+    available = ledger.updated_at(STAGE_LANDMARKS, statuses=(STATUS_DONE,))
+
+    # An output is up to date unless its landmarks were extracted again after it was written
+    pending = {}
+    for target_fps, output_dir in OUTPUT_DIRS.items():
+        stage = fps_stage(target_fps)
+        ledger.done_keys(stage, bootstrap=lambda: list_landmarks(output_dir))
+        reduced = ledger.updated_at(stage)
+        stale = {name for name, updated in reduced.items() if available.get(name, 0) > updated}
+        todo = [name for name in available if name not in reduced or name in stale]
+        for name in todo:
+            pending.setdefault(name, []).append((target_fps, output_dir))
+        logger.info(
+            f"{target_fps:g} fps: {len(todo)} npy files to process "
+            f"({len(reduced) - len(stale)} already reduced, {len(stale)} outdated)"
+        )
+
+    # Group this host's segments by source video; each file is read once for all of its targets
+    video_ids = ledger.video_ids(STAGE_LANDMARKS)
+    jobs_by_video = {}
+    for name in sorted(pending):
+        video_id = get_video_id(name, video_ids)
+        if in_shard(video_id):
+            # Landmark arrays are addressed as <INPUT_DIR>/<SENTENCE_NAME>.npy
+            jobs_by_video.setdefault(video_id, []).append((os.path.join(INPUT_DIR, f"{name}.npy"), pending[name]))
+    total_files = sum(len(jobs) for jobs in jobs_by_video.values())
     
-    if not npy_files:
-        logger.error(f"No npy files found in {INPUT_DIR}")
+    if not total_files:
+        if available:
+            logger.info(f"All {len(available)} npy files are already reduced")
+        else:
+            logger.error(f"No npy files found in {INPUT_DIR}")
         return
     
-    logger.info(f"Found {len(npy_files)} npy files to process")
-    logger.info(f"Target FPS: {TARGET_FPS}")
-    logger.info(f"Output directory: {OUTPUT_DIR}")
+    logger.info(f"Found {total_files} npy files of {len(jobs_by_video)} videos to process")
+    logger.info(f"Target FPS: {', '.join(f'{target_fps:g}' for target_fps in TARGET_FPS)} ({method})")
+    logger.info(f"Output directories: {', '.join(OUTPUT_DIRS.values())}")
     
-    # Process files in parallel
+    # Rates come from the metadata stored with each array; arrays without it
+    # fall back to the source video's FPS, resolved here once per video from
+    # the probe cache Step 3 filled, so workers never open videos
+    video_paths = {
+        video_id: get_source_video_path(jobs[0][0], video_id)
+        for video_id, jobs in jobs_by_video.items()
+    }
+    probes = get_probe_cache().get_many(video_paths.values())
+    video_fps = {
+        video_id: probes[video_path]["fps"] if probes[video_path]["valid"] else 0.0
+        for video_id, video_path in video_paths.items()
+    }
+
+    # Process videos in parallel, keeping at most S4_PENDING_TASKS submitted
+    exporter = MetricsExporter("s4")
+    tasks = iter(jobs_by_video.items())
+    completed_files = 0
+    completed_videos = 0
+    started = time.perf_counter()
     with ProcessPoolExecutor(max_workers=c.MAX_WORKERS) as executor:
-        for npy_file in npy_files:
-            executor.submit(process_fps_reduction, npy_file, TARGET_FPS, OUTPUT_DIR)
+        in_flight = {}
+        exhausted = False
+        while not exhausted or in_flight:
+            while not exhausted and len(in_flight) < c.S4_PENDING_TASKS:
+                task = next(tasks, None)
+                if task is None:
+                    exhausted = True
+                    break
+                video_id, jobs = task
+                future = executor.submit(
+                    process_video_reduction, jobs, video_paths[video_id], video_fps[video_id], method,
+                )
+                in_flight[future] = len(jobs)
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                completed_files += in_flight.pop(future)
+                completed_videos += 1
+                try:
+                    METRICS.merge(future.result())
+                except Exception as e:
+                    logger.error(f"Error in worker process: {str(e)}")
+
+            elapsed = time.perf_counter() - started
+            files_per_second = completed_files / elapsed
+            mb_per_second = METRICS.counters.get("s4_bytes_in", 0) / 1024 / 1024 / elapsed
+            METRICS.set_gauge("s4_files_remaining", total_files - completed_files)
+            METRICS.set_gauge("s4_files_per_second", files_per_second)
+            METRICS.set_gauge("s4_megabytes_per_second", mb_per_second)
+            exporter.maybe_export()
+            if completed_videos % c.PROGRESS_INTERVAL < len(done) or not (in_flight or not exhausted):
+                logger.info(
+                    f"Completed {completed_files}/{total_files} files of {completed_videos}/{len(jobs_by_video)} videos, "
+                    f"{files_per_second:.1f} files/s, {mb_per_second:.1f} MB/s"
+                )
+    exporter.export()
+
+    counters = METRICS.counters
+    logger.info(
+        f"Read {counters.get('s4_files_read', 0)} files and wrote {counters.get('s4_files_reduced', 0)} "
+        f"({counters.get('s4_files_failed', 0)} failed), "
+        f"{counters.get('s4_bytes_in', 0) / 1024 / 1024:.1f} MB in, "
+        f"{counters.get('s4_bytes_out', 0) / 1024 / 1024:.1f} MB out, "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
 
 
 if __name__ == "__main__":
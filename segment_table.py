@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Typed columnar copy of a segment TSV.
+
+Step 2 writes the caption segments as a tab-separated file (``conf.CSV_FILE``)
+that later steps used to re-parse in full. Next to it, ``<name>.npz`` holds
+the same table with one array per column: numbers as float64 and strings as
+fixed-width ``S`` (ASCII) or ``U`` arrays. The archive is uncompressed, so a
+reader that asks for a few columns only reads those members.
+
+``load_segment_columns`` returns a DataFrame of the requested columns from the
+table when it is at least as new as the TSV and falls back to parsing the TSV
+otherwise, so the TSV stays the source of truth. Build the table for an
+existing TSV (e.g. the How2Sign CSV) with:
+
+    python segment_table.py how2sign_realigned_train.csv
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+import conf as c
+from sharding import temporary_path
+
+logger = logging.getLogger(__name__)
+
+STRING_COLUMNS = ("VIDEO_NAME", "VIDEO_ID", "SENTENCE_ID", "SENTENCE_NAME", "SENTENCE")
+
+
+def table_path(csv_path):
+    """Path of the columnar table of a TSV."""
+    return f"{os.path.splitext(csv_path)[0]}.npz"
+
+
+def is_current(csv_path):
+    """True if the TSV has a table that is at least as new as the TSV itself."""
+    path = table_path(csv_path)
+    if not os.path.exists(path):
+        return False
+    return not os.path.exists(csv_path) or os.path.getmtime(path) >= os.path.getmtime(csv_path)
+
+
+def _string_array(values):
+    array = np.array(["" if value is None or value != value else str(value) for value in values])
+    if array.dtype.kind != "U" or not array.size:
+        return array.astype("U")
+    try:
+        return array.astype("S")
+    except UnicodeEncodeError:
+        return array
+
+
+def _column_array(name, values):
+    if name not in STRING_COLUMNS:
+        try:
+            return np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            pass
+    return _string_array(values)
+
+
+def write_table(csv_path, columns):
+    """
+    Write {column: values} as the table of `csv_path`, atomically. STRING_COLUMNS
+    and columns that are not numeric are stored as text, all others as float64.
+    """
+    path = table_path(csv_path)
+    arrays = {name: _column_array(name, values) for name, values in columns.items()}
+    tmp_path = temporary_path(path)
+    with open(tmp_path, "wb") as out_file:
+        np.savez(out_file, **arrays)
+    os.replace(tmp_path, path)
+    logger.info("Wrote %d rows of %s to %s", len(next(iter(arrays.values()), [])), csv_path, path)
+
+
+def _decode(array):
+    return array.astype("U") if array.dtype.kind == "S" else array
+
+
+def read_table(csv_path, columns=None):
+    """Return {column: array} from the table of `csv_path`, decoding strings to str."""
+    with np.load(table_path(csv_path)) as table:
+        names = table.files if columns is None else columns
+        return {name: _decode(table[name]) for name in names}
+
+
+def _column(array):
+    if array.dtype.kind not in "SU":
+        return array
+    values = _decode(array).astype(object)
+    values[array == array.dtype.type()] = np.nan
+    return values
+
+
+def _frame(arrays, columns):
+    return pd.DataFrame({name: _column(arrays[name]) for name in columns}, columns=columns, copy=False)
+
+
+def segment_columns(csv_path):
+    """Column names of a segment table, from the columnar table if current."""
+    if is_current(csv_path):
+        with np.load(table_path(csv_path)) as table:
+            return list(table.files)
+    return pd.read_csv(csv_path, delimiter="\t", nrows=0).columns.tolist()
+
+
+def load_segment_columns(csv_path, columns):
+    """
+    Load the given columns of a segment TSV as a DataFrame. Empty strings and
+    unparsable rows behave as with pd.read_csv: missing values are NaN and
+    malformed lines are skipped.
+    """
+    return pd.concat(iter_segment_columns(csv_path, columns, None), ignore_index=True)
+
+
+def iter_segment_columns(csv_path, columns, chunksize):
+    """
+    Like load_segment_columns, but yields DataFrames of at most `chunksize`
+    rows (all rows if None). Strings of the table are decoded one chunk at a
+    time, so memory is bounded by the compact column arrays plus one chunk.
+    """
+    if is_current(csv_path):
+        with np.load(table_path(csv_path)) as table:
+            arrays = {name: table[name] for name in columns}
+        rows = len(arrays[columns[0]])
+        step = chunksize or max(rows, 1)
+        for offset in range(0, max(rows, 1), step):
+            chunk = {name: array[offset:offset + step] for name, array in arrays.items()}
+            yield _frame(chunk, columns).set_axis(range(offset, offset + len(chunk[columns[0]])))
+        return
+    logger.info("No current columnar table for %s; parsing the TSV", csv_path)
+    reader = pd.read_csv(
+        csv_path,
+        delimiter="\t",
+        on_bad_lines="skip",
+        usecols=columns,
+        dtype={name: str for name in columns if name in STRING_COLUMNS},
+        chunksize=chunksize,
+    )
+    yield from ([reader] if chunksize is None else reader)
+
+
+def convert(csv_path):
+    """Build the table of an existing TSV and return its row count."""
+    data = pd.read_csv(
+        csv_path,
+        delimiter="\t",
+        on_bad_lines="skip",
+        dtype={name: str for name in STRING_COLUMNS},
+    )
+    write_table(csv_path, {name: data[name].tolist() for name in data.columns})
+    return len(data)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the columnar table of segment TSV files")
+    parser.add_argument("csv_files", nargs="*", default=[c.CSV_FILE], help="TSV files (default: conf.CSV_FILE)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    for csv_path in args.csv_files:
+        convert(csv_path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    main()
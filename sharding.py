@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Deterministic split of the dataset across several hosts.
+
+Every stage assigns a video to shard ``shard_of(video_id, NUM_SHARDS)``, a
+stable hash of the video ID, so s1, s3 and s4 on a host agree on which videos
+it owns without any coordination. Hosts share the dataset directory (e.g. over
+NFS) but each keeps its own SQLite files (ledger, probe cache) and metrics
+snapshots, whose paths get a ``-shardXXX-of-YYY`` suffix, because SQLite locking
+is not reliable on network filesystems.
+
+Select the shard with ``--shard-index/--num-shards`` on any stage, or with
+``conf.SHARD_INDEX``/``conf.NUM_SHARDS``. ``verify_shards.py`` merges the
+per-shard ledgers and checks that every shard finished its share.
+"""
+import hashlib
+import logging
+import os
+import socket
+
+import conf as c
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(video_id, num_shards):
+    """Stable shard number of a video ID (independent of PYTHONHASHSEED)."""
+    digest = hashlib.blake2b(str(video_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % num_shards
+
+
+def in_shard(video_id, shard_index=None, num_shards=None):
+    """True if the video belongs to the given (default: configured) shard."""
+    num_shards = c.NUM_SHARDS if num_shards is None else num_shards
+    shard_index = c.SHARD_INDEX if shard_index is None else shard_index
+    return num_shards <= 1 or shard_of(video_id, num_shards) == shard_index
+
+
+def shard_suffix(shard_index=None, num_shards=None):
+    """Suffix for per-shard files; empty when the run is not sharded."""
+    num_shards = c.NUM_SHARDS if num_shards is None else num_shards
+    shard_index = c.SHARD_INDEX if shard_index is None else shard_index
+    if num_shards <= 1:
+        return ""
+    return f"-shard{shard_index:03d}-of-{num_shards:03d}"
+
+
+def shard_local_path(path, shard_index=None, num_shards=None):
+    """Insert the shard suffix before a path's extension."""
+    stem, extension = os.path.splitext(path)
+    return f"{stem}{shard_suffix(shard_index, num_shards)}{extension}"
+
+
+def temporary_path(path):
+    """
+    Sibling temporary path for an atomic write (write, then os.replace). The
+    host name and process ID keep writers on different hosts apart.
+    """
+    return f"{path}.tmp-{socket.gethostname()}-{os.getpid()}"
+
+
+def add_shard_arguments(parser):
+    parser.add_argument("--shard-index", type=int, help="Shard processed by this host (default: conf.SHARD_INDEX)")
+    parser.add_argument("--num-shards", type=int, help="Total number of shards (default: conf.NUM_SHARDS)")
+    return parser
+
+
+def configure_shard(shard_index=None, num_shards=None):
+    """Apply shard settings from the command line on top of conf."""
+    if num_shards is not None:
+        c.NUM_SHARDS = num_shards
+    if shard_index is not None:
+        c.SHARD_INDEX = shard_index
+    if c.NUM_SHARDS < 1 or not 0 <= c.SHARD_INDEX < c.NUM_SHARDS:
+        raise ValueError(f"Invalid shard {c.SHARD_INDEX} of {c.NUM_SHARDS}")
+    if c.NUM_SHARDS > 1:
+        logger.info("Processing shard %d of %d", c.SHARD_INDEX, c.NUM_SHARDS)
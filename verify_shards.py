@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Merge the per-shard job ledgers of a multi-host run and verify completeness.
+
+Each host of a sharded run (see sharding.py) keeps its own ledger next to
+``conf.LEDGER_PATH``. This script copies them into the main ledger and then,
+for every stage and shard, compares the items the shard owns with what the
+ledger says was done and what is actually on disk:
+
+    python verify_shards.py --num-shards 8
+    python verify_shards.py --num-shards 8 --no-merge --stage landmarks
+
+The exit status is 1 if any shard has missing, failed or unfinished items, or
+items marked done whose output does not exist.
+"""
+import argparse
+import logging
+import os
+import sys
+from collections import Counter
+
+import conf as c
+import segment_table
+from existing_video_ids import load_existing_video_id_list
+from job_ledger import (
+    DONE_STATUSES,
+    STAGE_LANDMARKS,
+    STAGE_TRANSCRIPT,
+    STAGE_VIDEO,
+    STATUS_DONE,
+    JobLedger,
+    fps_stage,
+)
+from landmark_store import list_landmarks
+from s4_fps_reduce import get_output_dir, get_target_fps_list, get_video_id
+from sharding import shard_local_path, shard_of
+
+logger = logging.getLogger(__name__)
+
+
+def merge_ledgers(ledger, num_shards):
+    """Merge every existing per-shard ledger into `ledger`."""
+    for shard_index in range(num_shards):
+        path = shard_local_path(c.LEDGER_PATH, shard_index, num_shards)
+        if not os.path.exists(path):
+            logger.warning("No ledger for shard %d (%s)", shard_index, path)
+            continue
+        merged = ledger.merge_from(path)
+        logger.info("Merged %d jobs from shard %d", merged, shard_index)
+
+
+def file_stems(directory, extension):
+    if not os.path.isdir(directory):
+        return set()
+    return {name[:-len(extension)] for name in os.listdir(directory) if name.endswith(extension)}
+
+
+def load_video_list():
+    with open(c.ID, "r", encoding="utf-8") as id_file:
+        return {line.strip() for line in id_file if line.strip()}
+
+
+def load_segments():
+    """Return {SENTENCE_NAME: VIDEO_NAME} for the segments s3 would extract."""
+    columns = segment_table.segment_columns(c.CSV_FILE)
+    if "START" in columns and "END" in columns:
+        start_col, end_col = "START", "END"
+    else:
+        start_col, end_col = "START_REALIGNED", "END_REALIGNED"
+    columns = ["VIDEO_NAME", "SENTENCE_NAME", start_col, end_col]
+    data = segment_table.load_segment_columns(c.CSV_FILE, columns).dropna()
+    data = data[data[end_col] - data[start_col] <= 60]
+    return dict(zip(data.SENTENCE_NAME, data.VIDEO_NAME))
+
+
+def expected_items(stage, ledger):
+    """Return ({key: video_id}, set of keys with output on disk) for a stage."""
+    if stage == STAGE_TRANSCRIPT:
+        items = {video_id: video_id for video_id in load_video_list()}
+        outputs = file_stems(c.TRANSCRIPT_DIR, ".json")
+    elif stage == STAGE_VIDEO:
+        skipped = load_existing_video_id_list()
+        items = {video_id: video_id for video_id in load_video_list() - skipped}
+        outputs = file_stems(c.VIDEO_DIR, ".mp4")
+    elif stage == STAGE_LANDMARKS:
+        # Only segments whose source video was downloaded can be extracted
+        items = {
+            name: video_id
+            for name, video_id in load_segments().items()
+            if os.path.exists(os.path.join(c.VIDEO_DIR, f"{video_id}.mp4"))
+        }
+        outputs = list_landmarks(c.NPY_DIR)
+    else:
+        target_fps = next(fps for fps in get_target_fps_list() if fps_stage(fps) == stage)
+        video_ids = ledger.video_ids(STAGE_LANDMARKS)
+        items = {
+            name: get_video_id(name, video_ids)
+            for name in ledger.keys(STAGE_LANDMARKS, statuses=(STATUS_DONE,))
+        }
+        outputs = list_landmarks(get_output_dir(target_fps))
+    return items, outputs
+
+
+def verify_stage(ledger, stage, num_shards):
+    """Log per-shard completeness of a stage and return True if every shard is complete."""
+    items, outputs = expected_items(stage, ledger)
+    statuses = ledger.statuses(stage)
+    complete = True
+    counts = [Counter() for _ in range(num_shards)]
+    for key, video_id in items.items():
+        shard = counts[shard_of(video_id, num_shards)]
+        status = statuses.get(key, "missing")
+        shard[status] += 1
+        if status == STATUS_DONE and key not in outputs:
+            shard["done without output"] += 1
+
+    for shard_index, shard in enumerate(counts):
+        total = sum(count for status, count in shard.items() if status != "done without output")
+        done = sum(shard[status] for status in DONE_STATUSES)
+        problems = {status: count for status, count in shard.items() if status not in DONE_STATUSES}
+        details = ", ".join(f"{count} {status}" for status, count in sorted(problems.items()))
+        if problems:
+            complete = False
+            logger.warning("%s shard %d: %d/%d done; %s", stage, shard_index, done, total, details)
+        else:
+            logger.info("%s shard %d: %d/%d done", stage, shard_index, done, total)
+    return complete
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Merge per-shard ledgers and verify every shard is complete")
+    parser.add_argument("--num-shards", type=int, default=c.NUM_SHARDS, help="Number of shards of the run")
+    parser.add_argument("--ledger", default=c.LEDGER_PATH, help="Ledger to merge into and verify")
+    parser.add_argument("--no-merge", action="store_true", help="Verify the ledger without merging shards")
+    parser.add_argument(
+        "--stage",
+        action="append",
+        choices=[STAGE_TRANSCRIPT, STAGE_VIDEO, STAGE_LANDMARKS, *map(fps_stage, get_target_fps_list())],
+        help="Stage to verify (default: all)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    ledger = JobLedger(args.ledger)
+    if not args.no_merge and args.num_shards > 1:
+        merge_ledgers(ledger, args.num_shards)
+
+    stages = args.stage or [STAGE_TRANSCRIPT, STAGE_VIDEO, STAGE_LANDMARKS]
+    if not args.stage and not c.EXTRACT_FPS:
+        # With EXTRACT_FPS, s3 writes the target rate directly and s4 does nothing
+        stages.extend(map(fps_stage, get_target_fps_list()))
+    complete = True
+    for stage in stages:
+        complete &= verify_stage(ledger, stage, args.num_shards)
+    return 0 if complete else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Persistent cache of per-video stream properties shared by every stage.
+
+Probing a video means opening it with OpenCV, which is slow enough to matter
+when it happens once per caption segment. Results (fps, frame count, duration,
+resolution and whether the file could be opened) are stored in a small SQLite
+database keyed by path and revalidated against the file's size and mtime, so a
+video is probed again only after it changes on disk.
+
+Cache misses are probed concurrently on a thread pool; OpenCV releases the GIL
+while opening and reading container headers.
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+
+import cv2
+
+import conf as c
+from job_ledger import transaction
+from sharding import shard_local_path
+
+logger = logging.getLogger(__name__)
+
+PROBE_FIELDS = ("fps", "frame_count", "duration", "width", "height", "valid")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    fps REAL NOT NULL,
+    frame_count INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    valid INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+INVALID_PROBE = dict(fps=0.0, frame_count=0, duration=0.0, width=0, height=0, valid=False)
+
+
+def probe_video(video_path):
+    """Open a video with OpenCV and return its stream properties."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            return dict(INVALID_PROBE)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+        return dict(
+            fps=fps,
+            frame_count=frame_count,
+            duration=frame_count / fps if fps > 0 else 0.0,
+            width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            valid=fps > 0,
+        )
+    finally:
+        cap.release()
+
+
+class VideoProbeCache:
+    """Per-process handle on the probe cache database."""
+
+    def __init__(self, path=None):
+        self.path = path or shard_local_path(c.PROBE_CACHE_PATH)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def _cached(self, video_path, stat):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(PROBE_FIELDS)} FROM probes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (video_path, stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+        if row is None:
+            return None
+        probe = dict(zip(PROBE_FIELDS, row))
+        probe["valid"] = bool(probe["valid"])
+        return probe
+
+    def _store(self, entries):
+        with self._lock, transaction(self._conn):
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO probes (path, size, mtime_ns, {', '.join(PROBE_FIELDS)}) "
+                f"VALUES (?, ?, ?, {', '.join('?' * len(PROBE_FIELDS))})",
+                (
+                    (video_path, stat.st_size, stat.st_mtime_ns, *(probe[f] for f in PROBE_FIELDS))
+                    for video_path, stat, probe in entries
+                ),
+            )
+
+    def get(self, video_path):
+        """Return the probe of one video, probing it only if the cache is stale."""
+        return self.get_many([video_path], max_workers=1)[video_path]
+
+    def get_many(self, video_paths, max_workers=None):
+        """
+        Return {path: probe} for every given video. Missing files are reported
+        as invalid without being cached, so they are probed once downloaded.
+        """
+        probes = {}
+        misses = []
+        missing = 0
+        for video_path in dict.fromkeys(video_paths):
+            try:
+                stat = os.stat(video_path)
+            except OSError:
+                probes[video_path] = dict(INVALID_PROBE)
+                missing += 1
+                continue
+            cached = self._cached(video_path, stat)
+            if cached is None:
+                misses.append((video_path, stat))
+            else:
+                probes[video_path] = cached
+
+        if misses:
+            workers = max(1, min(max_workers or c.PROBE_WORKERS, len(misses)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(probe_video, (video_path for video_path, _ in misses)))
+            self._store((video_path, stat, probe) for (video_path, stat), probe in zip(misses, results))
+            for (video_path, _), probe in zip(misses, results):
+                probes[video_path] = probe
+            logger.info(
+                "Probed %d videos (%d cached, %d missing)",
+                len(misses), len(probes) - len(misses) - missing, missing,
+            )
+        return probes
+
+
+_CACHES = {}
+
+
+def get_probe_cache(path=None):
+    """Return this process's probe cache handle (cached per process ID)."""
+    key = (os.getpid(), path or shard_local_path(c.PROBE_CACHE_PATH))
+    if key not in _CACHES:
+        _CACHES[key] = VideoProbeCache(path)
+    return _CACHES[key]
+
+
+def close_probe_caches():
+    """Close and forget every probe cache handle opened by this process."""
+    for cache in _CACHES.values():
+        cache.close()
+    _CACHES.clear()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fill the video probe cache for a directory of videos")
+    parser.add_argument("--video-dir", default=c.VIDEO_DIR, help="Directory of .mp4 files to probe")
+    parser.add_argument("--cache", default=c.PROBE_CACHE_PATH, help="Path to the probe cache database")
+    parser.add_argument("--workers", type=int, default=c.PROBE_WORKERS, help="Concurrent probes")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    video_paths = sorted(glob(os.path.join(args.video_dir, "*.mp4")))
+    probes = VideoProbeCache(args.cache).get_many(video_paths, max_workers=args.workers)
+    invalid = sorted(path for path, probe in probes.items() if not probe["valid"])
+    logger.info("%d videos in cache, %d invalid", len(probes), len(invalid))
+    for path in invalid:
+        logger.warning("Invalid video: %s", path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    main()